@@ -1,104 +1,23 @@
-import math
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from typing import List
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image, ImageTk, ImageDraw, ImageFont
 import time
+from square_cutter import SquareCutter
 
-class Square:
-    def __init__(self, size: int, x: int, y: int):
-        self.size = size
-        self.x = x
-        self.y = y
+# Период обновления хода вычислений в окне, мс
+PROGRESS_INTERVAL = 100
+# Размер изображения на холсте и наибольший размер сохраняемого PNG, пиксели
+CANVAS_IMAGE_SIZE = 350
+EXPORT_IMAGE_SIZE = 2000
+# Номер квадрата выводится, только если сторона квадрата на изображении не меньше этого
+MIN_LABEL_SIZE = 16
 
-class SquareCutter:
-    def __init__(self, size: int):
-        self.size = size
-        self.grid = [[0] * size for _ in range(size)]
-        self.best_answer = float('inf')
-        self.best_answer_squares: List[Square] = []
-        self.operations_amount = 0
-
-    @staticmethod
-    def is_prime(num: int) -> bool:
-        if num < 2:
-            return False
-        for i in range(2, int(math.sqrt(num)) + 1):
-            if num % i == 0:
-                return False
-        return True
-
-    def split_square(self) -> List[Square]:
-        if self.size % 2 == 0:
-            half_size = self.size // 2
-            return [
-                Square(half_size, 0, 0),
-                Square(half_size, 0, half_size),
-                Square(half_size, half_size, 0),
-                Square(half_size, half_size, half_size),
-            ]
-
-        if self.is_prime(self.size) and self.size % 2 != 0:
-            half_size = self.size // 2
-            large_size = half_size + 1
-
-            self.place_square(0, 0, large_size, 1)
-            self.best_answer_squares.append(Square(large_size, 0, 0))
-
-            self.place_square(large_size, 0, half_size, 1)
-            self.best_answer_squares.append(Square(half_size, large_size, 0))
-
-            self.place_square(0, large_size, half_size, 1)
-            self.best_answer_squares.append(Square(half_size, 0, large_size))
-
-            self.backtrack(self.best_answer_squares)
-        else:
-            self.backtrack([])
-        
-        return self.best_answer_squares
-
-    def can_place(self, x: int, y: int, square_size: int) -> bool:
-        if x + square_size > self.size or y + square_size > self.size:
-            return False
-        for i in range(y, y + square_size):
-            for j in range(x, x + square_size):
-                self.operations_amount += 1
-                if self.grid[i][j] == 1:
-                    return False
-        return True
-
-    def place_square(self, x: int, y: int, square_size: int, value: int) -> None:
-        for i in range(y, y + square_size):
-            for j in range(x, x + square_size):
-                self.grid[i][j] = value
-
-    def backtrack(self, current_squares: List[Square]) -> None:
-        if len(current_squares) >= self.best_answer:
-            return
-
-        next_x, next_y = -1, -1
-        for i in range(self.size):
-            for j in range(self.size):
-                if self.grid[i][j] == 0:
-                    next_x, next_y = j, i
-                    break
-            if next_x != -1:
-                break
-
-        if next_x == -1:
-            if len(current_squares) < self.best_answer:
-                self.best_answer = len(current_squares)
-                self.best_answer_squares = current_squares.copy()
-            return
-
-        max_size = min(self.size - 1, self.size - next_x, self.size - next_y)
-        for size in range(max_size, 0, -1):
-            if self.can_place(next_x, next_y, size):
-                self.place_square(next_x, next_y, size, 1)
-                current_squares.append(Square(size, next_x, next_y))
-                self.backtrack(current_squares)
-                current_squares.pop()
-                self.place_square(next_x, next_y, size, 0)
+COLORS = [
+    (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0),
+    (255, 0, 255), (0, 255, 255), (255, 165, 0), (128, 0, 128),
+    (165, 42, 42), (255, 192, 203), (128, 128, 128), (0, 128, 0), (0, 0, 128)
+]
 
 class SquareCutterGUI:
     def __init__(self, root):
@@ -109,6 +28,12 @@ class SquareCutterGUI:
         # Переменные
         self.size_var = tk.IntVar(value=5)
         self.result_squares = []
+        self.cutter = None
+        self.worker = None
+        self.worker_error = None
+        self.progress = None
+        self.start_time = 0
+        self.canvas_image = None
         
         self.setup_ui()
         
@@ -125,14 +50,19 @@ class SquareCutterGUI:
         size_entry = ttk.Entry(input_frame, textvariable=self.size_var, width=10)
         size_entry.grid(row=0, column=1, sticky=tk.W, padx=(10, 0))
         
-        ttk.Button(input_frame, text="Выполнить разбиение", 
-                  command=self.execute_cutting).grid(row=0, column=2, padx=(20, 0))
+        self.execute_button = ttk.Button(input_frame, text="Выполнить разбиение", 
+                                         command=self.execute_cutting)
+        self.execute_button.grid(row=0, column=2, padx=(20, 0))
+        
+        self.cancel_button = ttk.Button(input_frame, text="Отмена", 
+                                        command=self.cancel_cutting, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=3, padx=(10, 0))
         
         ttk.Button(input_frame, text="Сохранить результат", 
-                  command=self.save_result).grid(row=0, column=3, padx=(10, 0))
+                  command=self.save_result).grid(row=0, column=4, padx=(10, 0))
         
         ttk.Button(input_frame, text="Сохранить изображение", 
-                  command=self.save_image).grid(row=0, column=4, padx=(10, 0))
+                  command=self.save_image).grid(row=0, column=5, padx=(10, 0))
         
         # Results section
         results_frame = ttk.LabelFrame(main_frame, text="Результаты", padding="10")
@@ -186,7 +116,7 @@ class SquareCutterGUI:
             if size < 1:
                 messagebox.showerror("Ошибка", "Размер квадрата должен быть положительным числом")
                 return
-            if size > 20:
+            if size > 40:
                 if not messagebox.askyesno("Предупреждение", 
                                          "Большие размеры могут работать медленно. Продолжить?"):
                     return
@@ -195,20 +125,74 @@ class SquareCutterGUI:
             self.results_text.delete(1.0, tk.END)
             self.info_text.delete(1.0, tk.END)
             self.canvas.delete("all")
+            self.result_squares = []
             
-            # Execute algorithm
-            start_time = time.time()
-            cutter = SquareCutter(size)
-            self.result_squares = cutter.split_square()
-            end_time = time.time()
+            # Execute algorithm in a background thread
+            self.cutter = SquareCutter(size)
+            self.cutter.progress_callback = self.on_progress
+            self.progress = None
+            self.worker_error = None
+            self.start_time = time.time()
+            self.worker = threading.Thread(target=self.run_cutter, args=(self.cutter,), daemon=True)
+            self.worker.start()
             
-            # Display results
-            self.display_results(cutter, end_time - start_time)
-            self.visualize_grid()
+            self.execute_button.config(state=tk.DISABLED)
+            self.cancel_button.config(state=tk.NORMAL)
+            self.root.after(PROGRESS_INTERVAL, self.poll_worker)
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Произошла ошибка: {str(e)}")
     
+    def run_cutter(self, cutter):
+        # Runs in the worker thread, Tk widgets must not be touched here
+        try:
+            cutter.split_square()
+        except Exception as e:
+            self.worker_error = e
+    
+    def on_progress(self, operations, squares):
+        # Called from the worker thread, the snapshot is picked up by poll_worker
+        self.progress = (operations, squares)
+    
+    def cancel_cutting(self):
+        if self.cutter is not None:
+            self.cutter.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+    
+    def poll_worker(self):
+        execution_time = time.time() - self.start_time
+        
+        if self.progress is not None:
+            operations, squares = self.progress
+            if squares is not self.result_squares:
+                self.result_squares = squares
+                self.visualize_grid()
+            
+            info_text = "Идет поиск...\n"
+            info_text += f"Операций: {operations}\n"
+            info_text += f"Лучшее найденное: {len(squares)} квадратов\n"
+            info_text += f"Прошло времени: {execution_time:.1f} секунд\n"
+            self.info_text.delete(1.0, tk.END)
+            self.info_text.insert(1.0, info_text)
+        
+        if self.worker.is_alive():
+            self.root.after(PROGRESS_INTERVAL, self.poll_worker)
+            return
+        
+        self.execute_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.results_text.delete(1.0, tk.END)
+        self.info_text.delete(1.0, tk.END)
+        
+        if self.worker_error is not None:
+            messagebox.showerror("Ошибка", f"Произошла ошибка: {str(self.worker_error)}")
+            return
+        
+        # Display results
+        self.result_squares = self.cutter.best_answer_squares
+        self.display_results(self.cutter, execution_time)
+        self.visualize_grid()
+    
     def display_results(self, cutter, execution_time):
         # Display results in text widget
         result_text = f"Размер квадрата: {cutter.size}\n"
@@ -223,57 +207,67 @@ class SquareCutterGUI:
         self.results_text.insert(1.0, result_text)
         
         # Display info
-        info_text = f"Алгоритм завершен успешно!\n"
-        info_text += f"Оптимальное разбиение найдено.\n"
+        if cutter.cancelled:
+            info_text = "Поиск прерван пользователем.\n"
+            info_text += "Показано лучшее найденное разбиение.\n"
+        else:
+            info_text = "Алгоритм завершен успешно!\n"
+            info_text += "Оптимальное разбиение найдено.\n"
         info_text += f"Квадрат разбит на {len(self.result_squares)} частей.\n"
         
         if cutter.size % 2 == 0:
             info_text += "Использовано разбиение для четного размера.\n"
+        elif cutter.from_table and cutter.prime_factor == cutter.size:
+            info_text += "Разбиение взято из таблицы найденных разбиений.\n"
         elif cutter.is_prime(cutter.size):
             info_text += "Использовано разбиение для простого нечетного числа.\n"
+        elif cutter.decompose and cutter.prime_factor < cutter.size:
+            info_text += f"Использовано масштабирование разбиения для простого делителя {cutter.prime_factor}.\n"
         else:
             info_text += "Использован алгоритм backtracking.\n"
         
         self.info_text.insert(1.0, info_text)
     
+    def render_image(self, image_size: int) -> Image.Image:
+        """Draws the tiling into a single image_size x image_size picture"""
+        scale = image_size / self.cutter.size
+        img = Image.new('RGB', (image_size + 1, image_size + 1), 'white')
+        draw = ImageDraw.Draw(img)
+        line_width = max(1, min(3, round(scale / 10)))
+        font = ImageFont.load_default()
+        
+        # Squares cover the whole board, so only their borders are drawn, not every grid line
+        for idx, square in enumerate(self.result_squares):
+            color = COLORS[idx % len(COLORS)]
+            
+            x1 = round(square.x * scale)
+            y1 = round(square.y * scale)
+            x2 = round((square.x + square.size) * scale)
+            y2 = round((square.y + square.size) * scale)
+            
+            draw.rectangle([x1, y1, x2, y2], fill=color, outline='black', width=line_width)
+            
+            # Number only the squares that are large enough to fit it
+            if x2 - x1 >= MIN_LABEL_SIZE:
+                center_x = (x1 + x2) // 2
+                center_y = (y1 + y2) // 2
+                draw.text((center_x - 5, center_y - 8), str(idx + 1), fill='black', font=font)
+        
+        return img
+    
     def visualize_grid(self):
+        self.canvas.delete("all")
         if not self.result_squares:
             return
-            
-        size = self.size_var.get()
-        cell_size = min(350 // size, 30)  # Adaptive cell size
-        canvas_size = size * cell_size
         
-        # Adjust canvas size
-        self.canvas.config(width=canvas_size + 20, height=canvas_size + 20)
-        
-        colors = ['red', 'green', 'blue', 'yellow', 'magenta', 'cyan', 'orange', 
-                 'purple', 'brown', 'pink', 'gray', 'darkgreen', 'navy']
+        image_size = min(self.cutter.size * 30, CANVAS_IMAGE_SIZE)
         
-        # Draw grid
-        for i in range(size + 1):
-            x = i * cell_size + 10
-            self.canvas.create_line(x, 10, x, canvas_size + 10, fill='black')
-            y = i * cell_size + 10
-            self.canvas.create_line(10, y, canvas_size + 10, y, fill='black')
+        # Adjust canvas size
+        self.canvas.config(width=image_size + 20, height=image_size + 20)
         
-        # Draw squares
-        for idx, square in enumerate(self.result_squares):
-            color = colors[idx % len(colors)]
-            
-            x1 = square.x * cell_size + 10
-            y1 = square.y * cell_size + 10
-            x2 = (square.x + square.size) * cell_size + 10
-            y2 = (square.y + square.size) * cell_size + 10
-            
-            # Draw filled square
-            self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline='black', width=2)
-            
-            # Draw square number
-            center_x = (x1 + x2) // 2
-            center_y = (y1 + y2) // 2
-            self.canvas.create_text(center_x, center_y, text=str(idx + 1), 
-                                  font=('Arial', 10, 'bold'))
+        # The whole picture is one image item, the reference must be kept alive
+        self.canvas_image = ImageTk.PhotoImage(self.render_image(image_size))
+        self.canvas.create_image(10, 10, anchor=tk.NW, image=self.canvas_image)
     
     def save_result(self):
         if not self.result_squares:
@@ -289,7 +283,7 @@ class SquareCutterGUI:
         if filename:
             try:
                 with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(f"Разбиение квадрата размером {self.size_var.get()}\n")
+                    f.write(f"Разбиение квадрата размером {self.cutter.size}\n")
                     f.write(f"Количество квадратов: {len(self.result_squares)}\n\n")
                     for i, square in enumerate(self.result_squares):
                         f.write(f"{square.x + 1} {square.y + 1} {square.size}\n")
@@ -316,42 +310,8 @@ class SquareCutterGUI:
                 messagebox.showerror("Ошибка", f"Не удалось сохранить изображение: {str(e)}")
     
     def create_png_image(self, filename: str):
-        size = self.size_var.get()
-        cell_size = 40
-        image_size = size * cell_size
-        
-        img = Image.new('RGB', (image_size, image_size), 'white')
-        draw = ImageDraw.Draw(img)
-        
-        colors = [
-            (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0),
-            (255, 0, 255), (0, 255, 255), (255, 165, 0), (128, 0, 128),
-            (165, 42, 42), (255, 192, 203), (128, 128, 128), (0, 128, 0), (0, 0, 128)
-        ]
-        
-        # Draw grid
-        for i in range(size + 1):
-            draw.line([(i * cell_size, 0), (i * cell_size, image_size)], fill='black', width=2)
-            draw.line([(0, i * cell_size), (image_size, i * cell_size)], fill='black', width=2)
-        
-        # Draw squares
-        for idx, square in enumerate(self.result_squares):
-            color = colors[idx % len(colors)]
-            
-            x1 = square.x * cell_size
-            y1 = square.y * cell_size
-            x2 = (square.x + square.size) * cell_size
-            y2 = (square.y + square.size) * cell_size
-            
-            draw.rectangle([x1, y1, x2, y2], fill=color, outline='black', width=3)
-            
-            # Add number
-            center_x = (x1 + x2) // 2
-            center_y = (y1 + y2) // 2
-            draw.text((center_x - 5, center_y - 8), str(idx + 1), fill='black', 
-                     font=ImageDraw.ImageFont.load_default())
-        
-        img.save(filename)
+        image_size = min(self.cutter.size * 40, EXPORT_IMAGE_SIZE)
+        self.render_image(image_size).save(filename)
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,643 @@
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, List, Optional
+
+# Таблицы уже найденных оптимальных разбиений: поставляемая с программой только читается,
+# новые результаты дописываются в локальную (в репозиторий она не попадает). Версия меняется,
+# когда меняется формат таблицы или алгоритм, которым она построена; таблица другой версии игнорируется
+SEED_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tilings.json")
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tilings.local.json")
+TABLE_VERSION = 1
+
+# Через сколько узлов поиска процесс сверяет свой рекорд с общим
+SYNC_INTERVAL = 1024
+# Сколько подзадач в среднем приходится на один процесс при параллельном поиске
+TASKS_PER_WORKER = 8
+
+class Square:
+    def __init__(self, size: int, x: int, y: int):
+        self.size = size
+        self.x = x
+        self.y = y
+
+class SquareCutter:
+    # Загруженные таблицы разбиений вместе с поставляемой: путь к файлу -> {n: [[x, y, size], ...]}
+    table_cache = {}
+
+    def __init__(self, size: int, decompose: bool = True, table_path: Optional[str] = TABLE_PATH,
+                 workers: Optional[int] = 1, symmetry: bool = True):
+        self.size = size
+        # Для составного n решаем задачу для наименьшего простого делителя p
+        # и масштабируем найденное разбиение в n / p раз
+        self.decompose = decompose
+        # Проверочный запуск без отсечения симметрий должен действительно выполнить поиск,
+        # поэтому таблица разбиений в нем не читается и не пополняется
+        self.table_path = table_path if symmetry else None
+        self.prime_factor = self.smallest_prime_factor(size)
+        # Размеры доски и наибольший допустимый квадрат (весь квадрат целиком брать нельзя)
+        self.width = size
+        self.height = size
+        self.max_square = size - 1
+        # Аргументы конструктора, по которым процессы пула создают такую же доску
+        # (подзадачи решаются поиском, таблица разбиений в них не нужна)
+        self.board_args = (size,)
+        self.board_kwargs = {"table_path": None, "symmetry": symmetry}
+        # Доска хранится как "линия горизонта": heights[x] - число занятых клеток
+        # в столбце x сверху. Квадраты всегда ставятся в первую свободную клетку,
+        # поэтому занятая часть каждого столбца непрерывна от верхнего края.
+        self.heights = [0] * size
+        # Отсечение симметричных разбиений; отключается для проверки результатов
+        self.symmetry = symmetry
+        # Первая клетка после рамки из трех квадратов и симметричная ей относительно диагонали
+        self.transpose_cells = None
+        if size > 1 and size % 2 == 1:
+            half_size, large_size = self.frame_sizes()
+            self.transpose_cells = ((large_size, half_size), (half_size, large_size))
+        self.best_answer = float('inf')
+        self.best_answer_squares: List[Square] = []
+        self.operations_amount = 0
+        # Разбиение взято из таблицы без поиска
+        self.from_table = False
+        # Число процессов для поиска (None - все ядра) и общий для них рекорд
+        self.workers = workers or os.cpu_count() or 1
+        self.shared_best = None
+        # Ход поиска: progress_callback(operations_amount, best_answer_squares) вызывается
+        # из потока поиска; после cancel() поиск завершается с лучшим найденным разбиением
+        self.progress_callback: Optional[Callable[[int, List[Square]], None]] = None
+        self.cancel_event = threading.Event()
+        self.cancelled = False
+
+    @staticmethod
+    def is_prime(num: int) -> bool:
+        if num < 2:
+            return False
+        for i in range(2, int(math.sqrt(num)) + 1):
+            if num % i == 0:
+                return False
+        return True
+
+    @staticmethod
+    def smallest_prime_factor(num: int) -> int:
+        if num < 2:
+            return num
+        for i in range(2, math.isqrt(num) + 1):
+            if num % i == 0:
+                return i
+        return num
+
+    @staticmethod
+    def is_valid_tiling(size: int, squares: list) -> bool:
+        """Проверяет, что квадраты [x, y, size] без наложений покрывают доску size x size"""
+        area = 0
+        for x, y, square_size in squares:
+            if square_size < 1 or square_size >= size or x < 0 or y < 0:
+                return False
+            if x + square_size > size or y + square_size > size:
+                return False
+            area += square_size * square_size
+        if area != size * size:
+            return False
+
+        for i, (x1, y1, size1) in enumerate(squares):
+            for x2, y2, size2 in squares[:i]:
+                if x1 < x2 + size2 and x2 < x1 + size1 and y1 < y2 + size2 and y2 < y1 + size1:
+                    return False
+        return True
+
+    @staticmethod
+    def read_table(path: str) -> dict:
+        """Читает таблицу разбиений с диска, пропуская записи, которые не являются разбиениями"""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != TABLE_VERSION:
+            return {}
+
+        tilings = data.get("tilings", {})
+        if not isinstance(tilings, dict):
+            return {}
+
+        table = {}
+        for n, flat in tilings.items():
+            # Квадраты хранятся одним списком x1, y1, size1, x2, y2, size2, ...
+            try:
+                size = int(n)
+                squares = [flat[i:i + 3] for i in range(0, len(flat), 3)]
+                if SquareCutter.is_valid_tiling(size, squares):
+                    table[size] = squares
+            except (TypeError, ValueError):
+                continue
+        return table
+
+    def load_table(self) -> dict:
+        """Возвращает поставляемую таблицу разбиений, дополненную таблицей table_path;
+        при первом обращении читает их с диска"""
+        if self.table_path is None:
+            return {}
+        if self.table_path not in SquareCutter.table_cache:
+            table = self.read_table(SEED_TABLE_PATH)
+            table.update(self.read_table(self.table_path))
+            SquareCutter.table_cache[self.table_path] = table
+        return SquareCutter.table_cache[self.table_path]
+
+    def save_table(self, squares: List[Square]) -> None:
+        """Добавляет найденное разбиение в таблицу table_path и записывает ее на диск.
+        Поставляемая таблица не меняется"""
+        if self.table_path is None:
+            return
+        table = self.load_table()
+        saved = self.read_table(self.table_path)
+        saved[self.size] = table[self.size] = [[square.x, square.y, square.size] for square in squares]
+        # Записи, добавленные на диск другими процессами, тоже сохраняются
+        for n, stored in saved.items():
+            table.setdefault(n, stored)
+
+        data = {
+            "version": TABLE_VERSION,
+            "tilings": {str(n): [value for square in saved[n] for value in square] for n in sorted(saved)},
+        }
+        try:
+            temp_path = f"{self.table_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file, separators=(",", ":"))
+            os.replace(temp_path, self.table_path)
+        except OSError:
+            pass
+
+    def split_scaled(self) -> List[Square]:
+        """Разбивает квадрат составного размера, масштабируя разбиение для наименьшего простого делителя"""
+        scale = self.size // self.prime_factor
+        base_cutter = SquareCutter(self.prime_factor, self.decompose, self.table_path, self.workers,
+                                   self.symmetry)
+        base_cutter.cancel_event = self.cancel_event
+        if self.progress_callback is not None:
+            base_cutter.progress_callback = lambda operations, squares: self.progress_callback(
+                operations, self.scale_squares(squares, scale))
+
+        base_squares = base_cutter.split_square()
+        self.operations_amount = base_cutter.operations_amount
+        self.cancelled = base_cutter.cancelled
+        self.from_table = base_cutter.from_table
+        self.best_answer_squares = self.scale_squares(base_squares, scale)
+        self.best_answer = len(self.best_answer_squares)
+        return self.best_answer_squares
+
+    def frame_sizes(self) -> tuple:
+        """Размеры (меньший, больший) квадратов рамки: рамка наименьшего простого делителя p,
+        увеличенная в n / p раз (для простого n это (n - 1) / 2 и (n + 1) / 2)"""
+        scale = self.size // self.prime_factor
+        half_size = self.prime_factor // 2 * scale
+        return half_size, half_size + scale
+
+    @staticmethod
+    def scale_squares(squares: List[Square], scale: int) -> List[Square]:
+        return [Square(square.size * scale, square.x * scale, square.y * scale) for square in squares]
+
+    def split_square(self) -> List[Square]:
+        if self.size % 2 == 0:
+            half_size = self.size // 2
+            self.best_answer_squares = [
+                Square(half_size, 0, 0),
+                Square(half_size, 0, half_size),
+                Square(half_size, half_size, 0),
+                Square(half_size, half_size, half_size),
+            ]
+            self.best_answer = len(self.best_answer_squares)
+            return self.best_answer_squares
+
+        # Квадрат размера 1 нельзя разрезать на меньшие квадраты
+        if self.size == 1:
+            return self.best_answer_squares
+
+        table_squares = self.load_table().get(self.size)
+        if table_squares:
+            self.best_answer_squares = [Square(size, x, y) for x, y, size in table_squares]
+            self.best_answer = len(self.best_answer_squares)
+            self.from_table = True
+            return self.best_answer_squares
+
+        if self.decompose and self.prime_factor < self.size:
+            return self.split_scaled()
+
+        # Три больших квадрата ставятся заранее для любого нечетного n
+        half_size, large_size = self.frame_sizes()
+
+        current_squares = []
+
+        self.place_square(0, 0, large_size, 1)
+        current_squares.append(Square(large_size, 0, 0))
+
+        self.place_square(large_size, 0, half_size, 1)
+        current_squares.append(Square(half_size, large_size, 0))
+
+        self.place_square(0, large_size, half_size, 1)
+        current_squares.append(Square(half_size, 0, large_size))
+
+        self.greedy_upper_bound(current_squares)
+        if self.workers > 1:
+            self.parallel_backtrack(current_squares)
+        else:
+            self.backtrack(current_squares)
+
+        if not self.cancelled:
+            self.save_table(self.best_answer_squares)
+
+        return self.best_answer_squares
+
+    def place_square(self, x: int, y: int, square_size: int, value: int) -> None:
+        top = y + square_size if value else y
+        self.heights[x:x + square_size] = [top] * square_size
+
+    def find_free_cell(self):
+        """Возвращает (x, y, ширина свободного участка) первой свободной клетки или None"""
+        y = min(self.heights)
+        if y == self.height:
+            return None
+        x = self.heights.index(y)
+        free_width = 1
+        while x + free_width < self.width and self.heights[x + free_width] == y:
+            free_width += 1
+        return x, y, free_width
+
+    def greedy_fill(self) -> List[Square]:
+        """Жадно достраивает разбиение самыми большими квадратами, доску оставляет без изменений"""
+        squares = []
+        free_cell = self.find_free_cell()
+        while free_cell is not None:
+            x, y, width = free_cell
+            size = min(self.max_square, width, self.height - y)
+            self.place_square(x, y, size, 1)
+            squares.append(Square(size, x, y))
+            free_cell = self.find_free_cell()
+
+        for square in reversed(squares):
+            self.place_square(square.x, square.y, square.size, 0)
+        return squares
+
+    def greedy_upper_bound(self, current_squares: List[Square]) -> None:
+        """Строит начальный рекорд для отсечений: в каждую свободную клетку ставится квадрат,
+        после которого жадное достраивание дает меньше всего квадратов"""
+        squares = current_squares.copy()
+        free_cell = self.find_free_cell()
+        while free_cell is not None:
+            x, y, width = free_cell
+            best_size, best_tail = 0, float('inf')
+            for size in range(min(self.max_square, width, self.height - y), 0, -1):
+                self.place_square(x, y, size, 1)
+                tail = len(self.greedy_fill())
+                self.place_square(x, y, size, 0)
+                if tail < best_tail:
+                    best_size, best_tail = size, tail
+
+            self.place_square(x, y, best_size, 1)
+            squares.append(Square(best_size, x, y))
+            free_cell = self.find_free_cell()
+
+        for square in reversed(squares[len(current_squares):]):
+            self.place_square(square.x, square.y, square.size, 0)
+
+        if len(squares) < self.best_answer:
+            self.best_answer = len(squares)
+            self.best_answer_squares = squares
+            self.report_progress()
+
+    def lower_bound(self) -> int:
+        """Допустимая оценка снизу числа квадратов, которые еще нужно поставить"""
+        # Каждая ступень линии горизонта ниже края доски требует отдельного квадрата:
+        # верхняя граница квадрата, закрывающего ее левую клетку, совпадает с высотой ступени
+        steps = 0
+        first_open = -1
+        previous = -1
+        for x, height in enumerate(self.heights):
+            if height < self.height:
+                if first_open == -1:
+                    first_open = x
+                if height != previous:
+                    steps += 1
+            previous = height
+
+        if steps == 0:
+            return 0
+
+        # Ни один из оставшихся квадратов не больше свободной полосы справа и снизу
+        max_size = min(self.max_square, self.height - min(self.heights), self.width - first_open)
+        remaining_area = self.width * self.height - sum(self.heights)
+        area_bound = -(-remaining_area // (max_size * max_size))
+
+        return max(steps, area_bound)
+
+    def cancel(self) -> None:
+        """Просит прервать поиск, может вызываться из другого потока"""
+        self.cancel_event.set()
+
+    def report_progress(self) -> None:
+        if self.progress_callback is not None:
+            self.progress_callback(self.operations_amount, self.best_answer_squares)
+
+    def sync(self) -> None:
+        """Периодически вызывается из поиска: забирает рекорд, найденный другими процессами,
+        проверяет запрос на отмену и сообщает о ходе вычислений"""
+        if self.shared_best is not None:
+            self.best_answer = min(self.best_answer, self.shared_best.value)
+        if self.cancel_event.is_set():
+            self.cancelled = True
+        self.report_progress()
+
+    def publish_best(self) -> None:
+        """Сообщает новый рекорд остальным процессам"""
+        if self.shared_best is not None:
+            with self.shared_best.get_lock():
+                if self.best_answer < self.shared_best.value:
+                    self.shared_best.value = self.best_answer
+
+    def candidate_sizes(self, x: int, y: int, max_size: int, current_squares: List[Square]):
+        """Размеры квадратов, которые пробуются в свободной клетке (x, y), от больших к меньшим.
+        Рамка симметрична относительно диагонали, поэтому из пары отраженных разбиений
+        достаточно рассмотреть то, где квадрат в клетке после рамки не меньше своего отражения"""
+        if self.symmetry and self.transpose_cells is not None and (x, y) == self.transpose_cells[1]:
+            first_cell = self.transpose_cells[0]
+            for square in current_squares:
+                if (square.x, square.y) == first_cell:
+                    max_size = min(max_size, square.size)
+        return range(max_size, 0, -1)
+
+    def backtrack(self, current_squares: List[Square]) -> None:
+        if self.cancelled or len(current_squares) + self.lower_bound() >= self.best_answer:
+            return
+
+        free_cell = self.find_free_cell()
+
+        if free_cell is None:
+            if len(current_squares) < self.best_answer:
+                self.best_answer = len(current_squares)
+                self.best_answer_squares = current_squares.copy()
+                self.publish_best()
+                self.report_progress()
+            return
+
+        next_x, next_y, width = free_cell
+        max_size = min(self.max_square, width, self.height - next_y)
+        for size in self.candidate_sizes(next_x, next_y, max_size, current_squares):
+            self.operations_amount += 1
+            if self.operations_amount % SYNC_INTERVAL == 0:
+                self.sync()
+            self.place_square(next_x, next_y, size, 1)
+            current_squares.append(Square(size, next_x, next_y))
+            self.backtrack(current_squares)
+            current_squares.pop()
+            self.place_square(next_x, next_y, size, 0)
+
+    def expand(self, current_squares: List[Square]) -> List[List[Square]]:
+        """Возвращает все продолжения частичного разбиения на один квадрат, доску не меняет"""
+        for square in current_squares:
+            self.place_square(square.x, square.y, square.size, 1)
+
+        children = []
+        if len(current_squares) + self.lower_bound() < self.best_answer:
+            free_cell = self.find_free_cell()
+            if free_cell is None:
+                self.best_answer = len(current_squares)
+                self.best_answer_squares = current_squares.copy()
+            else:
+                next_x, next_y, width = free_cell
+                max_size = min(self.max_square, width, self.height - next_y)
+                for size in self.candidate_sizes(next_x, next_y, max_size, current_squares):
+                    self.operations_amount += 1
+                    children.append(current_squares + [Square(size, next_x, next_y)])
+
+        for square in reversed(current_squares):
+            self.place_square(square.x, square.y, square.size, 0)
+        return children
+
+    def parallel_backtrack(self, current_squares: List[Square]) -> None:
+        """Делит дерево поиска на первых уровнях на независимые подзадачи и решает их в пуле процессов"""
+        # Доска в этот момент содержит current_squares, подзадачи строятся с пустой доски
+        for square in reversed(current_squares):
+            self.place_square(square.x, square.y, square.size, 0)
+
+        tasks = [current_squares.copy()]
+        while tasks and len(tasks) < self.workers * TASKS_PER_WORKER:
+            tasks = [child for task in tasks for child in self.expand(task)]
+
+        if tasks:
+            shared_best = multiprocessing.Value('i', self.best_answer)
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                     initargs=(shared_best,)) as executor:
+                for squares, operations in executor.map(solve_subproblem, repeat(type(self)), repeat(self.board_args),
+                                                          repeat(self.board_kwargs), tasks):
+                    self.operations_amount += operations
+                    if squares and len(squares) < self.best_answer:
+                        self.best_answer = len(squares)
+                        self.best_answer_squares = squares
+
+        for square in current_squares:
+            self.place_square(square.x, square.y, square.size, 1)
+
+class RectangleCutter(SquareCutter):
+    """Разбиение прямоугольника width x height на минимальное число квадратов"""
+    # Гильотинное ДП, общее для всех запросов: (ширина, высота) -> (число квадратов, разрез)
+    guillotine_memo = {}
+
+    def __init__(self, width: int, height: int, workers: Optional[int] = 1, symmetry: bool = True):
+        # Таблица разбиений хранит только квадраты
+        super().__init__(width, decompose=False, table_path=None, workers=workers, symmetry=symmetry)
+        self.height = height
+        self.max_square = min(width, height)
+        self.board_args = (width, height)
+        self.board_kwargs = {"symmetry": symmetry}
+        self.transpose_cells = None
+
+    def candidate_sizes(self, x: int, y: int, max_size: int, current_squares: List[Square]):
+        """Размеры квадратов для клетки (x, y). Отражения прямоугольника переставляют его углы,
+        поэтому достаточно разбиений, где угловой квадрат в (0, 0) не меньше остальных угловых"""
+        sizes = range(max_size, 0, -1)
+        if not self.symmetry or not current_squares:
+            return sizes
+
+        corner_size = current_squares[0].size
+        forbidden = [
+            size for size in {self.width - x, self.height - y}
+            if corner_size < size <= max_size and (
+                (x + size == self.width and (y == 0 or y + size == self.height))
+                or (x == 0 and y + size == self.height))
+        ]
+        if forbidden:
+            return [size for size in sizes if size not in forbidden]
+        return sizes
+
+    @classmethod
+    def guillotine(cls, width: int, height: int) -> tuple:
+        """Лучшее разбиение, получаемое только сквозными разрезами.
+        Возвращает (число квадратов, разрез), разрез - (вертикальный ли, позиция) или None"""
+        key = (width, height)
+        plan = cls.guillotine_memo.get(key)
+        if plan is None:
+            if width == height:
+                plan = (1, None)
+            else:
+                plan = (float('inf'), None)
+                for position in range(1, width // 2 + 1):
+                    count = cls.guillotine(position, height)[0] + cls.guillotine(width - position, height)[0]
+                    if count < plan[0]:
+                        plan = (count, (True, position))
+                for position in range(1, height // 2 + 1):
+                    count = cls.guillotine(width, position)[0] + cls.guillotine(width, height - position)[0]
+                    if count < plan[0]:
+                        plan = (count, (False, position))
+            cls.guillotine_memo[key] = plan
+        return plan
+
+    def guillotine_squares(self, x: int, y: int, width: int, height: int) -> List[Square]:
+        """Восстанавливает квадраты гильотинного разбиения прямоугольника с углом в (x, y)"""
+        cut = self.guillotine(width, height)[1]
+        if cut is None:
+            return [Square(width, x, y)]
+        vertical, position = cut
+        if vertical:
+            return (self.guillotine_squares(x, y, position, height)
+                    + self.guillotine_squares(x + position, y, width - position, height))
+        return (self.guillotine_squares(x, y, width, position)
+                + self.guillotine_squares(x, y + position, width, height - position))
+
+    def split_rectangle(self) -> List[Square]:
+        # Гильотинное разбиение дешево, часто оптимально и служит начальным рекордом
+        self.best_answer_squares = self.guillotine_squares(0, 0, self.width, self.height)
+        self.best_answer = len(self.best_answer_squares)
+        self.report_progress()
+
+        if self.workers > 1:
+            self.parallel_backtrack([])
+        else:
+            self.backtrack([])
+        return self.best_answer_squares
+
+# Общий рекорд процессов пула, передается в init_worker при их запуске
+shared_best_value = None
+
+def init_worker(shared_best) -> None:
+    global shared_best_value
+    shared_best_value = shared_best
+
+def solve_subproblem(cutter_class: type, board_args: tuple, board_kwargs: dict, current_squares: List[Square]):
+    """Ищет лучшее продолжение частичного разбиения в процессе пула.
+    Возвращает найденное разбиение (пустое, если общий рекорд не улучшен) и число узлов"""
+    cutter = cutter_class(*board_args, **board_kwargs)
+    cutter.shared_best = shared_best_value
+    cutter.best_answer = shared_best_value.value
+    for square in current_squares:
+        cutter.place_square(square.x, square.y, square.size, 1)
+    cutter.backtrack(current_squares)
+    return cutter.best_answer_squares, cutter.operations_amount
+
+def parse_range(text: str) -> List[int]:
+    if "-" in text:
+        first, last = text.split("-", 1)
+        return list(range(int(first), int(last) + 1))
+    return [int(text)]
+
+def parse_sizes(specs: List[str]) -> list:
+    """Разбирает список размеров вида "7", "2-50" или "3,5,7" и прямоугольников вида "5x7" или "2-9x3-8" """
+    sizes = []
+    for spec in specs:
+        for part in spec.split(","):
+            if not part:
+                continue
+            if "x" in part:
+                widths, heights = part.split("x", 1)
+                sizes.extend((width, height) for width in parse_range(widths) for height in parse_range(heights))
+            else:
+                sizes.extend(parse_range(part))
+    return sizes
+
+def solve_size(size, decompose: bool = True, table_path: Optional[str] = TABLE_PATH,
+               workers: Optional[int] = 1) -> dict:
+    """Разбивает квадрат размера size или прямоугольник (ширина, высота)
+    и возвращает результат в виде словаря для вывода"""
+    start_time = time.perf_counter()
+    if isinstance(size, tuple):
+        cutter = RectangleCutter(*size, workers=workers)
+        squares = cutter.split_rectangle()
+        size = f"{size[0]}x{size[1]}"
+    else:
+        cutter = SquareCutter(size, decompose, table_path, workers)
+        squares = cutter.split_square()
+    return {
+        "size": size,
+        "count": len(squares),
+        # Координаты, как и в окне программы, нумеруются с единицы
+        "squares": [[square.x + 1, square.y + 1, square.size] for square in squares],
+        "operations": cutter.operations_amount,
+        "time": round(time.perf_counter() - start_time, 6),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Разбиение квадрата n x n (или прямоугольника) на минимальное число квадратов "
+                    "без графического интерфейса")
+    parser.add_argument("sizes", nargs="+",
+                        help='размеры квадрата: "7", "2-50", "3,5,7"; прямоугольники: "5x7", "2-9x3-8"')
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="формат вывода")
+    parser.add_argument("--output", help="файл для результатов (по умолчанию стандартный вывод)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="сколько размеров решать одновременно в отдельных процессах (0 - все ядра)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="сколько процессов использовать для поиска одного размера (0 - все ядра)")
+    parser.add_argument("--no-decompose", action="store_true",
+                        help="не сводить составные размеры к наименьшему простому делителю")
+    parser.add_argument("--no-table", action="store_true",
+                        help="не читать и не пополнять таблицу найденных разбиений")
+    args = parser.parse_args()
+
+    try:
+        sizes = parse_sizes(args.sizes)
+    except ValueError:
+        parser.error("размеры должны быть целыми числами или диапазонами вида 2-50")
+    if any(min(size) < 1 if isinstance(size, tuple) else size < 1 for size in sizes):
+        parser.error("размер квадрата должен быть положительным числом")
+
+    jobs = args.jobs or os.cpu_count() or 1
+    # Внутри процессов пула новый пул не создается
+    workers = 1 if jobs > 1 else args.workers or None
+    table_path = None if args.no_table else TABLE_PATH
+    solve_args = (repeat(not args.no_decompose), repeat(table_path), repeat(workers))
+
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            writer = csv.writer(output)
+            writer.writerow(["size", "count", "operations", "time", "squares"])
+
+        if jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(solve_size, sizes, *solve_args)
+        else:
+            executor = None
+            results = map(solve_size, sizes, *solve_args)
+
+        for result in results:
+            if args.format == "csv":
+                squares = ";".join(" ".join(map(str, square)) for square in result["squares"])
+                writer.writerow([result["size"], result["count"], result["operations"], result["time"], squares])
+            else:
+                output.write(json.dumps(result) + "\n")
+            output.flush()
+
+        if executor is not None:
+            executor.shutdown()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,138 @@
-import random
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import struct
 import sys
 import heapq
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count, repeat
 
-def generateWeightMatrix(n: int, symmetric: bool = True):
-    matrix = [[0] * n for _ in range(n)]
-
-    for y in range(n):
-        for x in range(n):
-            if x == y:
-                matrix[y][x] = 0
-            elif symmetric:
-                if x > y:
-                    weight = random.randint(1, 10)
-                    matrix[y][x] = weight
-                    matrix[x][y] = weight
-            else:
-                if x != y:
-                    matrix[y][x] = random.randint(1, 10)
+import numpy as np
+
+# До какого размера графа точный ответ ищется динамикой Хелда-Карпа (память ~ 2^(n-1) * n)
+HELD_KARP_LIMIT = 20
+# Порядки обхода дерева в методе ветвей и границ
+BB_STRATEGIES = ("heuristic", "best", "dfs", "hybrid")
+# Сколько ближайших соседей просматривают 2-opt и Or-opt
+NEIGHBOUR_COUNT = 8
+# Сколько узлов гибридная стратегия держит в куче, прежде чем перейти к спускам в глубину
+BB_QUEUE_LIMIT = 1_000_000
+# Сколько подготовленных матриц хранится в кэше prepareMatrix и сколько клеток (n^2)
+# в них всех вместе: последняя подготовленная матрица остается в кэше при любом размере
+PREPARED_CACHE_SIZE = 16
+PREPARED_CACHE_CELLS = 1 << 22
+# Больше стольких оценок MST кэш не держит: при переполнении он очищается прямо во время поиска
+MST_CACHE_LIMIT = 1 << 20
+# Как часто (в узлах) процесс пула сверяет свой рекорд с общим
+SYNC_INTERVAL = 1024
+# Подзадач на процесс: мелкие подзадачи раздаются освободившимся процессам и выравнивают нагрузку
+TASKS_PER_WORKER = 8
+
+# Двоичный формат матрицы: заголовок из 32 байт (сигнатура, версия, флаги, n, dtype numpy),
+# затем веса построчно - вся матрица или только верхний треугольник с диагональю
+MATRIX_MAGIC = b"TSPM"
+MATRIX_VERSION = 1
+MATRIX_HEADER = struct.Struct("<4sBB2xQ8s8x")
+FLAG_SYMMETRIC = 1
+FLAG_TRIANGLE = 2
+# Генераторы заполняют матрицу блоками строк примерно такого числа клеток
+GENERATOR_BLOCK_CELLS = 1 << 22
+# Семейства случайных матриц generateInstances
+INSTANCE_FAMILIES = ("random", "euclidean")
+# Решатели пакетного режима: heuristic - только эвристика с локальным поиском
+SOLVERS = ("auto", "bb", "dp", "heuristic")
+
+def generateWeightMatrix(n: int, symmetric: bool = True, seed=None):
+    return randomMatrix(n, symmetric, seed=seed).tolist()
+
+def createBinaryMatrix(fileName: str, n: int, dtype=np.int32, symmetric: bool = False) -> np.memmap:
+    """Создает двоичный файл полной матрицы n x n и возвращает его, отображенный в память
+    для записи - генераторы пишут в него блоками, не держа всю матрицу в памяти"""
+    dtype = np.dtype(dtype)
+    with open(fileName, "wb") as file:
+        file.write(packMatrixHeader(n, dtype, symmetric, False))
+    return np.memmap(fileName, dtype=dtype, mode="r+", offset=MATRIX_HEADER.size, shape=(n, n))
+
+def generatorRows(n: int):
+    """Границы блоков строк, по которым генераторы заполняют матрицу"""
+    step = max(1, GENERATOR_BLOCK_CELLS // max(n, 1))
+    for first in range(0, n, step):
+        yield first, min(first + step, n)
+
+def randomMatrix(n: int, symmetric: bool = True, low: int = 1, high: int = 10, density: float = 1.0,
+                 seed=None, fileName: str = None) -> np.ndarray:
+    """Случайные целые веса от low до high. density - доля существующих ребер, остальные
+    равны 0 (нет ребра). Результат определяется seed. С fileName матрица пишется сразу
+    в двоичный файл и возвращается отображенной в память"""
+    rng = np.random.default_rng(seed)
+    if fileName is not None:
+        matrix = createBinaryMatrix(fileName, n, np.int32, symmetric)
+    else:
+        matrix = np.empty((n, n), dtype=np.int32)
+    
+    for first, last in generatorRows(n):
+        block = rng.integers(low, high + 1, size=(last - first, n), dtype=np.int32)
+        if density < 1.0:
+            block[rng.random(block.shape) >= density] = 0
+        if symmetric:
+            # Левая часть уже записана предыдущими блоками, квадрат на диагонали отражается
+            block[:, :first] = matrix[:first, first:last].T
+            square = np.triu(block[:, first:last], 1)
+            block[:, first:last] = square + square.T
+        else:
+            block[np.arange(last - first), np.arange(first, last)] = 0
+        matrix[first:last] = block
+    
+    if fileName is not None:
+        matrix.flush()
+    return matrix
 
+def euclideanMatrix(n: int, scale: int = 1000, seed=None, fileName: str = None) -> np.ndarray:
+    """Округленные евклидовы расстояния между n случайными точками квадрата scale x scale
+    (не меньше 1, чтобы совпавшие точки не давали отсутствующих ребер)"""
+    rng = np.random.default_rng(seed)
+    points = rng.random((n, 2)) * scale
+    if fileName is not None:
+        matrix = createBinaryMatrix(fileName, n, np.int32, True)
+    else:
+        matrix = np.empty((n, n), dtype=np.int32)
+    
+    for first, last in generatorRows(n):
+        distance = np.hypot(points[first:last, 0, None] - points[None, :, 0],
+                            points[first:last, 1, None] - points[None, :, 1])
+        block = np.maximum(np.rint(distance), 1).astype(np.int32)
+        block[np.arange(last - first), np.arange(first, last)] = 0
+        matrix[first:last] = block
+    
+    if fileName is not None:
+        matrix.flush()
     return matrix
 
+def generateInstances(directory: str, family: str, sizes: list, count: int, seed=None,
+                      symmetric: bool = True, density: float = 1.0) -> list:
+    """Пишет count двоичных матриц каждого размера из sizes в directory.
+    Зерна экземпляров порождаются из seed, так что набор воспроизводим целиком.
+    Возвращает имена созданных файлов"""
+    if family not in INSTANCE_FAMILIES:
+        raise ValueError(f"Неизвестное семейство матриц: {family}")
+    os.makedirs(directory, exist_ok=True)
+    
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes) * count)
+    fileNames = []
+    for index, (n, instance) in enumerate((n, i) for n in sizes for i in range(count)):
+        fileName = os.path.join(directory, f"{family}_{n}_{instance}.tspm")
+        if family == "euclidean":
+            euclideanMatrix(n, seed=seeds[index], fileName=fileName)
+        else:
+            randomMatrix(n, symmetric, density=density, seed=seeds[index], fileName=fileName)
+        fileNames.append(fileName)
+    return fileNames
+
 def saveWeightMatrix(fileName: str, matrix: list):
     with open(fileName, "w") as file:
         for line in matrix:
@@ -28,8 +141,76 @@ def saveWeightMatrix(fileName: str, matrix: list):
 def loadWightMatrix(fileName: str):
     with open(fileName, "r") as file:
         matrix = [list(map(int, line.split(" "))) for line in file.readlines()]
+    if any(len(row) != len(matrix) for row in matrix):
+        raise ValueError(f"{fileName}: матрица не квадратная")
     return matrix
 
+def saveBinaryMatrix(fileName: str, matrix, dtype=None, triangle: bool = False):
+    """Сохраняет матрицу в двоичном формате. triangle - хранить только верхний треугольник
+    (вдвое меньше места, но при загрузке матрица собирается в памяти целиком)"""
+    weights = np.asarray(matrix, dtype=dtype)
+    n = len(weights)
+    weights = weights.reshape(n, n)
+    symmetric = bool((weights == weights.T).all())
+    if triangle and not symmetric:
+        raise ValueError("Треугольное хранение возможно только для симметричной матрицы")
+    
+    with open(fileName, "wb") as file:
+        file.write(packMatrixHeader(n, weights.dtype, symmetric, triangle))
+        data = weights[np.triu_indices(n)] if triangle else weights
+        file.write(np.ascontiguousarray(data).tobytes())
+
+def packMatrixHeader(n: int, dtype, symmetric: bool, triangle: bool) -> bytes:
+    flags = (FLAG_SYMMETRIC if symmetric else 0) | (FLAG_TRIANGLE if triangle else 0)
+    return MATRIX_HEADER.pack(MATRIX_MAGIC, MATRIX_VERSION, flags, n, np.dtype(dtype).str.encode("ascii"))
+
+def readMatrixHeader(fileName: str):
+    """Заголовок двоичной матрицы: (n, dtype, symmetric, triangle) или None для текстового файла"""
+    with open(fileName, "rb") as file:
+        raw = file.read(MATRIX_HEADER.size)
+    if len(raw) < MATRIX_HEADER.size or not raw.startswith(MATRIX_MAGIC):
+        return None
+    magic, version, flags, n, dtype = MATRIX_HEADER.unpack(raw)
+    if version != MATRIX_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата матрицы: {version}")
+    return n, np.dtype(dtype.rstrip(b"\0").decode("ascii")), bool(flags & FLAG_SYMMETRIC), bool(flags & FLAG_TRIANGLE)
+
+def loadBinaryMatrix(fileName: str) -> np.ndarray:
+    """Загружает двоичную матрицу. Полная матрица отображается в память через numpy.memmap
+    без копирования и чтения файла; треугольная разворачивается в обычный массив n x n"""
+    header = readMatrixHeader(fileName)
+    if header is None:
+        raise ValueError(f"{fileName} не является двоичной матрицей")
+    n, dtype, symmetric, triangle = header
+    
+    if not triangle:
+        return np.memmap(fileName, dtype=dtype, mode="r", offset=MATRIX_HEADER.size, shape=(n, n))
+    
+    data = np.fromfile(fileName, dtype=dtype, offset=MATRIX_HEADER.size, count=n * (n + 1) // 2)
+    weights = np.zeros((n, n), dtype=dtype)
+    upper = np.triu_indices(n)
+    weights[upper] = data
+    weights[upper[1], upper[0]] = data
+    return weights
+
+def textToBinary(textFileName: str, binaryFileName: str, dtype=np.int32, triangle: bool = False):
+    """Переводит текстовую матрицу (формат saveWeightMatrix) в двоичную"""
+    weights = np.loadtxt(textFileName, dtype=dtype, ndmin=2)
+    saveBinaryMatrix(binaryFileName, weights, triangle=triangle)
+
+def binaryToText(binaryFileName: str, textFileName: str):
+    """Переводит двоичную матрицу в текстовый формат saveWeightMatrix"""
+    weights = loadBinaryMatrix(binaryFileName)
+    fmt = "%d" if np.issubdtype(weights.dtype, np.integer) else "%.17g"
+    np.savetxt(textFileName, weights, fmt=fmt, delimiter=" ")
+
+def loadMatrix(fileName: str) -> list:
+    """Матрица из текстового или двоичного файла (определяется по сигнатуре)
+    в виде списка списков, с которым работают решатели"""
+    if readMatrixHeader(fileName) is None:
+        return loadWightMatrix(fileName)
+    return loadBinaryMatrix(fileName).tolist()
+
 def printMatrix(matrix: list, title: str = ""):
     if title:
         print(f"\n{title}")
@@ -45,212 +226,974 @@ def printMatrix(matrix: list, title: str = ""):
         print()
 
 def primMST(matrix: list, vertices: set) -> float:
+    """Вес минимального остовного дерева на множестве вершин (алгоритм Прима за O(k^2)).
+    Для каждой вершины вне дерева хранится вес самого легкого ребра из дерева в нее"""
     if not vertices:
         return 0
     
-    n = len(matrix)
-    visited = set()
+    outside = sorted(vertices)
+    start = outside.pop(0)
     mst_weight = 0
     
-    start = next(iter(vertices))
-    visited.add(start)
+    row = matrix[start]
+    keys = [row[u] if row[u] > 0 else float('inf') for u in outside]
     
-    while len(visited) < len(vertices):
-        min_edge = float('inf')
-        next_vertex = -1
-        
-        for v in visited:
-            for u in vertices - visited:
-                if matrix[v][u] > 0 and matrix[v][u] < min_edge:
-                    min_edge = matrix[v][u]
-                    next_vertex = u
-        
-        if next_vertex == -1:
+    while outside:
+        min_edge = min(keys)
+        if min_edge == float('inf'):
             break
-            
+        
+        index = keys.index(min_edge)
+        next_vertex = outside[index]
         mst_weight += min_edge
-        visited.add(next_vertex)
+        
+        # Удаляем вершину из списка, переставляя на ее место последнюю
+        outside[index] = outside[-1]
+        keys[index] = keys[-1]
+        outside.pop()
+        keys.pop()
+        
+        row = matrix[next_vertex]
+        for i, u in enumerate(outside):
+            if 0 < row[u] < keys[i]:
+                keys[i] = row[u]
     
     return mst_weight
 
-def lowerBound1(matrix: list, path: list, visited: set) -> float:
-    n = len(matrix)
-    bound = 0
+def sortedEdges(matrix: list):
+    """Для каждой вершины списки исходящих и входящих ребер (вес, вершина) по возрастанию веса,
+    при равном весе - по номеру вершины. Строки сортирует numpy, списки строятся из чисел Python"""
+    weights = np.asarray(matrix)
+    n = len(weights)
+    weights = weights.reshape(n, n)
+    edges = []
+    for rows in (weights, weights.T):
+        order = np.argsort(rows, axis=1, kind="stable")
+        rowWeights = np.take_along_axis(rows, order, axis=1)
+        edges.append([[(weight, vertex) for weight, vertex in zip(rowWeight, rowOrder) if weight > 0]
+                      for rowWeight, rowOrder in zip(rowWeights.tolist(), order.tolist())])
+    return edges[0], edges[1]
+
+def nearestNeighbours(matrix: list, count: int = NEIGHBOUR_COUNT):
+    """Списки count ближайших вершин по исходящим и по входящим ребрам (по весу, затем номеру).
+    np.argpartition отбирает их без сортировки строк целиком"""
+    weights = np.array(matrix, dtype=np.float64)
+    n = len(weights)
+    weights = weights.reshape(n, n)
+    weights[weights <= 0] = np.inf
+    count = min(count, n)
+    neighbours = []
+    for rows in (weights, weights.T):
+        if 0 < count < n:
+            nearest = np.argpartition(rows, count - 1, axis=1)[:, :count]
+        else:
+            nearest = np.tile(np.arange(n), (n, 1))
+        nearestWeights = np.take_along_axis(rows, nearest, axis=1)
+        order = np.lexsort((nearest, nearestWeights), axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1).tolist()
+        nearestWeights = np.take_along_axis(nearestWeights, order, axis=1).tolist()
+        neighbours.append([[v for v, weight in zip(vertices, vertexWeights) if weight != float('inf')]
+                           for vertices, vertexWeights in zip(nearest, nearestWeights)])
+    return neighbours[0], neighbours[1]
+
+def lightestEdge(edges: list, allowedMask: int) -> float:
+    """Вес самого легкого ребра из отсортированного списка, ведущего в вершину из маски"""
+    for weight, vertex in edges:
+        if allowedMask >> vertex & 1:
+            return weight
+    return 0
 
-    parts = [path] + [[i] for i in range(n) if i not in visited]
+def lowerBound1(outgoing: list, incoming: list, start: int, last: int, unvisitedMask: int) -> float:
+    """Оценка по частям: путь start..last и каждая непосещенная вершина. Для каждой части
+    берется полусумма легчайших входящего (из концов других частей) и исходящего
+    (в начала других частей) ребер. По отсортированным спискам ребер это O(n) на узел"""
+    bound = (lightestEdge(incoming[start], unvisitedMask) + lightestEdge(outgoing[last], unvisitedMask)) / 2
+    
+    endsMask = unvisitedMask | (1 << last)
+    startsMask = unvisitedMask | (1 << start)
+    
+    vertex = 0
+    mask = unvisitedMask
+    while mask:
+        if mask & 1:
+            bit = 1 << vertex
+            bound += (lightestEdge(incoming[vertex], endsMask & ~bit)
+                      + lightestEdge(outgoing[vertex], startsMask & ~bit)) / 2
+        mask >>= 1
+        vertex += 1
+    
+    return bound
+
+def undirectedMatrix(matrix: list) -> list:
+    """Для несимметричной матрицы - матрица весов min(w(u, v), w(v, u)) по существующим ребрам.
+    MST по ней не больше любого пути через те же вершины в любом направлении, а Прим
+    по исходным направленным весам такой оценкой не является"""
+    weights = np.asarray(matrix)
+    n = len(weights)
+    weights = weights.reshape(n, n)
+    if (weights == weights.T).all():
+        return matrix
+    forward = weights > 0
+    backward = forward.T
+    undirected = np.where(forward & backward, np.minimum(weights, weights.T),
+                          np.where(forward, weights, np.where(backward, weights.T, 0)))
+    return undirected.tolist()
+
+def lowerBound2(matrix: list, unvisitedMask: int, cache: dict = None) -> float:
+    """Вес MST непосещенных вершин. Узлы с одинаковым множеством посещенных вершин
+    (разный порядок обхода) получают одну и ту же оценку, поэтому она кэшируется.
+    Кэш ограничен MST_CACHE_LIMIT записями, иначе длинный поиск рос бы в памяти без предела"""
+    if cache is not None and unvisitedMask in cache:
+        return cache[unvisitedMask]
+    
+    unvisited = [v for v in range(len(matrix)) if unvisitedMask >> v & 1]
+    bound = primMST(matrix, unvisited)
+    
+    if cache is not None:
+        if len(cache) >= MST_CACHE_LIMIT:
+            cache.clear()
+        cache[unvisitedMask] = bound
+    return bound
+
+def optimalityGap(cost: float, lowerBound: float):
+    """Доказанный относительный разрыв (cost - lowerBound) / cost; None, если цикла нет"""
+    if cost == float('inf'):
+        return None
+    if lowerBound >= cost or cost == 0:
+        return 0.0
+    return (cost - lowerBound) / cost
 
-    for part in parts:
-        start = part[0]
-        end = part[-1]
+class PreparedMatrix:
+    """Все, что решатели вычисляют по матрице независимо от начальной вершины: отсортированные
+    списки ребер, минимумы строк и столбцов, статистика ребер, матрица для MST и кэш оценок MST
+    по маскам непосещенных вершин. Создается через prepareMatrix и переиспользуется между
+    решениями и начальными вершинами"""
 
-        incoming = []
-        outgoing = []
+    def __init__(self, matrix: list):
+        n = len(matrix)
+        self.n = n
+        self.outgoing, self.incoming = sortedEdges(matrix)
+        self.rowMinimum = [edges[0][0] if edges else 0 for edges in self.outgoing]
+        self.columnMinimum = [edges[0][0] if edges else 0 for edges in self.incoming]
+        
+        self.edgeCount = sum(len(edges) for edges in self.outgoing)
+        totalWeight = sum(weight for edges in self.outgoing for weight, _ in edges)
+        # Средний вес ребра (S) и средний вес исходящих ребер каждой вершины (L) в формуле приоритета
+        self.averageWeight = totalWeight / self.edgeCount if self.edgeCount > 0 else 0
+        self.rowAverage = [sum(weight for weight, _ in edges) / n for edges in self.outgoing]
+        
+        self.mstMatrix = undirectedMatrix(matrix)
+        self.mstCache = {}
 
-        for otherPart in parts:
-            if otherPart != part:
-                otherPartStart = otherPart[0]
-                otherPartEnd = otherPart[-1]
+preparedMatrices = OrderedDict()
 
-                if matrix[otherPartEnd][start] != 0:
-                    incoming.append(matrix[otherPartEnd][start])
+def prepareMatrix(matrix: list) -> PreparedMatrix:
+    """Подготовленная матрица из кэша по хэшу ее содержимого (последние PREPARED_CACHE_SIZE,
+    но не больше PREPARED_CACHE_CELLS клеток, кроме самой последней)"""
+    weights = np.asarray(matrix)
+    key = hashlib.blake2b(repr((weights.shape, weights.dtype.str)).encode() + weights.tobytes(),
+                          digest_size=16).digest()
+    prepared = preparedMatrices.get(key)
+    if prepared is None:
+        prepared = PreparedMatrix(matrix)
+        preparedMatrices[key] = prepared
+        cells = sum(entry.n * entry.n for entry in preparedMatrices.values())
+        while len(preparedMatrices) > 1 and (len(preparedMatrices) > PREPARED_CACHE_SIZE
+                                             or cells > PREPARED_CACHE_CELLS):
+            _, evicted = preparedMatrices.popitem(last=False)
+            cells -= evicted.n * evicted.n
+    else:
+        preparedMatrices.move_to_end(key)
+    return prepared
 
-                if matrix[end][otherPartStart] != 0:
-                    outgoing.append(matrix[end][otherPartStart])
+def rootLowerBound(matrix: list, start: int) -> float:
+    """Нижняя оценка длины любого цикла: оценки корня дерева ветвей и границ и суммы
+    минимумов строк и столбцов (из каждой вершины выходит и в каждую входит одно ребро)"""
+    prepared = prepareMatrix(matrix)
+    unvisited = ((1 << prepared.n) - 1) & ~(1 << start)
+    if not unvisited:
+        return 0
+    return max(lowerBound1(prepared.outgoing, prepared.incoming, start, start, unvisited),
+               lowerBound2(prepared.mstMatrix, unvisited, prepared.mstCache),
+               sum(prepared.rowMinimum), sum(prepared.columnMinimum))
 
-        incomingMin = min(incoming) if incoming else 0
-        outgoingMin = min(outgoing) if outgoing else 0
+class SearchNode:
+    """Узел дерева ветвей и границ. Путь хранится цепочкой ссылок на родителя без копирования,
+    bound - стоимость пути плюс нижняя оценка его продолжения"""
+    __slots__ = ("vertex", "parent", "cost", "depth", "visited", "bound")
 
-        bound += (incomingMin + outgoingMin) / 2
+    def __init__(self, vertex: int, parent, cost: float, depth: int, visited: int, bound: float):
+        self.vertex = vertex
+        self.parent = parent
+        self.cost = cost
+        self.depth = depth
+        self.visited = visited
+        self.bound = bound
 
-    return bound
+def unwindPath(node: SearchNode) -> list:
+    """Восстанавливает путь по цепочке родителей"""
+    path = []
+    while node is not None:
+        path.append(node.vertex)
+        node = node.parent
+    path.reverse()
+    return path
 
-def lowerBound2(matrix: list, path: list, visited: set) -> float:
-    unvisited = set(range(len(matrix))) - visited
-    return primMST(matrix, unvisited)
+def makeTracer(verbose: int = 0, callback=None):
+    """Собирает обработчик событий солверов: печать трассировки уровня verbose
+    (0 - тишина, 1 - заголовок и улучшения рекорда, 2 - каждый узел) и callback(event, data).
+    Возвращает None, если события никому не нужны - тогда солверы их даже не формируют"""
+    if verbose <= 0 and callback is None:
+        return None
+
+    def trace(event: str, data: dict):
+        if verbose >= 1:
+            if event == "start":
+                print(f"\n{data['title']}")
+                for line in data.get("info", ()):
+                    print(line)
+            elif event == "incumbent":
+                print(f"Найден новый лучший путь: стоимость {data['cost']}")
+            elif event == "inserted":
+                print(f"Шаг {data['step']}: добавлена вершина {data['vertex']} в позицию {data['position']}, стоимость {data['cost']}")
+            elif event == "closed":
+                print(f"Замыкание цикла: стоимость {data['cost']}")
+            elif event == "progress":
+                gap = "нет" if data["gap"] is None else f"{data['gap']:.2%}"
+                print(f"Узлов {data['iteration']}: рекорд {data['incumbent']}, "
+                      f"нижняя оценка {data['lower_bound']:.2f}, разрыв {gap}, в очереди {data['queue']}")
+        if verbose >= 2:
+            if event == "expanded":
+                print(f"\nИтерация {data['iteration']}: путь {data['path']}, стоимость {data['cost']}")
+            elif event == "bounds":
+                print(f"Нижние оценки: LB1={data['lb1']:.2f}, LB2={data['lb2']:.2f}, максимум={data['lb']:.2f}")
+            elif event == "pruned":
+                print(f"Отсечение: {data['bound']:.2f} >= {data['best']}")
+            elif event == "pushed":
+                print(f"  Добавлен путь: {data['path']}, стоимость: {data['cost']}")
+        if callback is not None:
+            callback(event, data)
+
+    return trace
 
 def heuristicPriority(S: float, k: int, L: float, N: int) -> float:
     if k == 0:
         return float('inf')
     return (S/k + L/N) * (4*N/(3*N + k))
 
-def branchAndBoundV4(matrix: list, start: int):
+def branchAndBoundV4(matrix: list, start: int, verbose: int = 0, callback=None,
+                     strategy: str = "heuristic", memoryLimit: int = BB_QUEUE_LIMIT, incumbent: tuple = None,
+                     prefix: list = None, sharedBest=None, timeLimit: float = None, nodeLimit: int = None,
+                     sharedNodes=None):
+    """Метод ветвей и границ. Порядок обхода strategy: "heuristic" - приоритет варианта 4,
+    "best" - по стоимости плюс нижней оценке, "dfs" - в глубину, "hybrid" - best-first,
+    пока в очереди меньше memoryLimit узлов, дальше спуски в глубину.
+    incumbent - известный заранее цикл (путь, стоимость), с которого начинается отсечение.
+    prefix - начало пути [start, ...]: ищется только его лучшее продолжение (подзадача пула).
+    sharedBest - общий для процессов multiprocessing.Value со стоимостью рекорда; если рекорд
+    пришел оттуда, путь его знает другой процесс и возвращается None.
+    sharedNodes - общий счетчик раскрытых узлов: с ним nodeLimit - бюджет всех процессов вместе.
+    timeLimit (секунды, проверяется перед каждым узлом и каждым потомком) и nodeLimit (раскрытые узлы)
+    прерывают поиск: возвращается рекорд,
+    в счетчиках stopped = "time" / "nodes", lower_bound - минимум оценок узлов очереди
+    (ниже него цикла нет) и gap - доказанный относительный разрыв рекорда с ней.
+    Каждые SYNC_INTERVAL узлов отправляется событие progress с теми же величинами.
+    События: start, expanded, bounds, pruned, pushed, incumbent.
+    Возвращает (путь, стоимость, счетчики nodes_expanded / pruned / max_queue)"""
+    if strategy not in BB_STRATEGIES:
+        raise ValueError(f"Неизвестная стратегия обхода: {strategy}")
     n = len(matrix)
     bestPath = None
     bestCost = float('inf')
+    if incumbent is not None and incumbent[0] is not None:
+        bestPath, bestCost = list(incumbent[0]), incumbent[1]
+    stats = {"nodes_expanded": 0, "pruned": 0, "max_queue": 0, "stopped": None}
+    deadline = time.monotonic() + timeLimit if timeLimit is not None else None
     
-    print("\nМетод ветвей и границ (вариант 4)")
-    print(f"Начальная вершина: {start}")
-    print(f"Размер графа: {n}")
+    trace = makeTracer(verbose, callback)
+    if trace:
+        trace("start", {"title": "Метод ветвей и границ (вариант 4)",
+                        "info": [f"Начальная вершина: {start}", f"Размер графа: {n}",
+                                 f"Начальный рекорд: {bestCost}"]})
     
-    total_edges = 0
-    total_weight = 0
-    for i in range(n):
-        for j in range(n):
-            if matrix[i][j] > 0:
-                total_edges += 1
-                total_weight += matrix[i][j]
+    prepared = prepareMatrix(matrix)
+    S = prepared.averageWeight
+    rowAverage = prepared.rowAverage
+    L = rowAverage[start]
     
-    S = total_weight / total_edges if total_edges > 0 else 0
-    L = sum(matrix[start][j] for j in range(n) if matrix[start][j] > 0) / n
+    outgoing, incoming = prepared.outgoing, prepared.incoming
+    allMask = (1 << n) - 1
     
+    # Элемент очереди и стека: (ключ, стоимость, номер создания, узел). Номера уникальны,
+    # поэтому кортежи сравниваются только по числам и до узлов дело не доходит.
+    # Оценки считаются при создании узла: по ним упорядочивается best-first и отсекаются
+    # потомки, которые не стоит даже класть в очередь
     priority_queue = []
+    stack = []
+    counter = count()
+    mst_cache = prepared.mstCache
+    mst_matrix = prepared.mstMatrix
+    
+    def bounds(last: int, visited: int):
+        unvisited = allMask & ~visited
+        if not unvisited:
+            closing = matrix[last][start]
+            return (closing, closing) if closing > 0 else (float('inf'), float('inf'))
+        return (lowerBound1(outgoing, incoming, start, last, unvisited),
+                lowerBound2(mst_matrix, unvisited, mst_cache))
     
-    initial_path = [start]
-    initial_visited = set([start])
+    initial_node = None
+    initial_visited = 0
     initial_cost = 0
+    for depth, vertex in enumerate(prefix or [start], 1):
+        if initial_node is not None:
+            initial_cost += matrix[initial_node.vertex][vertex]
+        initial_visited |= 1 << vertex
+        initial_node = SearchNode(vertex, initial_node, initial_cost, depth, initial_visited, initial_cost)
+    initial_node.bound = initial_cost + max(bounds(initial_node.vertex, initial_visited))
     
-    initial_priority = heuristicPriority(S, 1, L, n)
+    if strategy == "heuristic":
+        initial_key = heuristicPriority(S, initial_node.depth, L, n)
+    else:
+        initial_key = initial_node.bound
+    initial_entry = (initial_key, initial_cost, next(counter), initial_node)
+    
+    if strategy == "dfs":
+        stack.append(initial_entry)
+    else:
+        priority_queue.append(initial_entry)
     
-    heapq.heappush(priority_queue, (initial_priority, initial_cost, initial_path, initial_visited))
+    def frontierBound() -> float:
+        """Глобальная нижняя оценка: ни одно продолжение узлов очереди не дешевле"""
+        bound = min((entry[3].bound for entry in priority_queue), default=float('inf'))
+        return min(bestCost, bound, min((entry[3].bound for entry in stack), default=float('inf')))
     
     iteration = 0
+    max_queue = 1
+    pruned = 0
+    # Оценка узла, раскрытие которого прервал timeLimit: его поддерево осталось непросмотренным
+    interruptedBound = float('inf')
     
-    while priority_queue:
+    while stack or priority_queue:
+        if nodeLimit is not None:
+            if sharedNodes is None:
+                exhausted = iteration >= nodeLimit
+            else:
+                with sharedNodes.get_lock():
+                    exhausted = sharedNodes.value >= nodeLimit
+                    if not exhausted:
+                        sharedNodes.value += 1
+            if exhausted:
+                stats["stopped"] = "nodes"
+                break
+        
+        # Часы проверяются на каждом узле: это дешевле оценок даже одного потомка,
+        # а на больших графах тысяча узлов между проверками - это секунды
+        if deadline is not None and time.monotonic() > deadline:
+            stats["stopped"] = "time"
+            break
+        
+        if iteration % SYNC_INTERVAL == 0:
+            if sharedBest is not None and sharedBest.value < bestCost:
+                bestCost = sharedBest.value
+                bestPath = None
+            if trace and iteration:
+                lowerBound = frontierBound()
+                trace("progress", {"iteration": iteration, "incumbent": bestCost, "lower_bound": lowerBound,
+                                   "gap": optimalityGap(bestCost, lowerBound),
+                                   "queue": len(priority_queue) + len(stack)})
+        
         iteration += 1
         
-        priority, cost, path, visited = heapq.heappop(priority_queue)
+        # Начатый спуск в глубину доводится до конца раньше, чем берется узел из кучи
+        if stack:
+            node = stack.pop()[3]
+        else:
+            node = heapq.heappop(priority_queue)[3]
+        last_vertex = node.vertex
+        cost = node.cost
+        k = node.depth
+        visited = node.visited
         
-        print(f"\nИтерация {iteration}: путь {path}, стоимость {cost}")
+        if trace:
+            trace("expanded", {"iteration": iteration, "path": unwindPath(node), "cost": cost})
         
-        if len(path) == n:
-            if matrix[path[-1]][start] > 0:
-                total_cost = cost + matrix[path[-1]][start]
+        if k == n:
+            if matrix[last_vertex][start] > 0:
+                total_cost = cost + matrix[last_vertex][start]
                 if total_cost < bestCost:
                     bestCost = total_cost
-                    bestPath = path + [start]
-                    print(f"Найден новый лучший путь: стоимость {bestCost}")
+                    bestPath = unwindPath(node) + [start]
+                    if sharedBest is not None:
+                        with sharedBest.get_lock():
+                            if bestCost < sharedBest.value:
+                                sharedBest.value = bestCost
+                    if trace:
+                        trace("incumbent", {"path": bestPath, "cost": bestCost, "iteration": iteration})
             continue
         
-        lb1 = lowerBound1(matrix, path, visited)
-        lb2 = lowerBound2(matrix, path, visited)
-        lb = max(lb1, lb2)
+        if trace:
+            lb1, lb2 = bounds(last_vertex, visited)
+            trace("bounds", {"lb1": lb1, "lb2": lb2, "lb": node.bound - cost})
         
-        print(f"Нижние оценки: LB1={lb1:.2f}, LB2={lb2:.2f}, максимум={lb:.2f}")
-        
-        if cost + lb >= bestCost:
-            print(f"Отсечение: {cost + lb:.2f} >= {bestCost}")
+        # Рекорд мог улучшиться, пока узел лежал в очереди
+        if node.bound >= bestCost:
+            pruned += 1
+            if trace:
+                trace("pruned", {"path": unwindPath(node), "bound": node.bound, "best": bestCost})
             continue
         
-        last_vertex = path[-1]
+        # Исходящие ребра уже отсортированы по весу
+        new_priority = heuristicPriority(S, k + 1, rowAverage[last_vertex], n)
+        children = []
+        for weight, next_vertex in outgoing[last_vertex]:
+            if visited >> next_vertex & 1:
+                continue
+            
+            # На больших графах одна оценка - это целый Прим, и раскрытие узла длится секунды
+            if deadline is not None and time.monotonic() > deadline:
+                stats["stopped"] = "time"
+                interruptedBound = node.bound
+                break
+            
+            new_cost = cost + weight
+            new_visited = visited | 1 << next_vertex
+            new_bound = new_cost + max(bounds(next_vertex, new_visited))
+            
+            if new_bound >= bestCost:
+                pruned += 1
+                if trace:
+                    trace("pruned", {"path": unwindPath(node) + [next_vertex], "bound": new_bound, "best": bestCost})
+                continue
+            
+            new_node = SearchNode(next_vertex, node, new_cost, k + 1, new_visited, new_bound)
+            new_key = new_priority if strategy == "heuristic" else new_bound
+            children.append((new_key, new_cost, next(counter), new_node))
+            if trace:
+                trace("pushed", {"path": unwindPath(new_node), "cost": new_cost})
         
-        candidates = []
-        for next_vertex in range(n):
-            if next_vertex not in visited and matrix[last_vertex][next_vertex] > 0:
-                candidates.append(next_vertex)
+        if stats["stopped"]:
+            break
         
-        candidates.sort(key=lambda v: matrix[last_vertex][v])
+        if strategy == "dfs" or (strategy == "hybrid" and (stack or len(priority_queue) >= memoryLimit)):
+            # Самый перспективный потомок должен сниматься со стека первым
+            children.sort(reverse=True)
+            stack.extend(children)
+        else:
+            for child in children:
+                heapq.heappush(priority_queue, child)
         
-        for next_vertex in candidates:
-            new_path = path + [next_vertex]
-            new_visited = visited | {next_vertex}
-            new_cost = cost + matrix[last_vertex][next_vertex]
-            
-            k = len(new_path)
-            L_new = sum(matrix[last_vertex][j] for j in range(n) if matrix[last_vertex][j] > 0) / n
-            new_priority = heuristicPriority(S, k, L_new, n)
-            
-            heapq.heappush(priority_queue, (new_priority, new_cost, new_path, new_visited))
-            print(f"  Добавлен путь: {new_path}, стоимость: {new_cost}")
+        if len(priority_queue) + len(stack) > max_queue:
+            max_queue = len(priority_queue) + len(stack)
+    
+    stats["nodes_expanded"] = iteration
+    stats["pruned"] = pruned
+    stats["max_queue"] = max_queue
+    stats["lower_bound"] = min(frontierBound(), interruptedBound) if stats["stopped"] else bestCost
+    stats["gap"] = optimalityGap(bestCost, stats["lower_bound"])
+    return bestPath, bestCost, stats
+
+sharedBestValue = None
+sharedNodesValue = None
+
+def initWorker(sharedBest, sharedNodes) -> None:
+    global sharedBestValue, sharedNodesValue
+    sharedBestValue = sharedBest
+    sharedNodesValue = sharedNodes
+
+def solveSubtree(matrix: list, start: int, strategy: str, incumbent: tuple, deadline: float, nodeLimit: int,
+                 task: tuple):
+    """Лучшее продолжение пути prefix в процессе пула с общим рекордом. task - (оценка, prefix)"""
+    prefixBound, prefix = task
+    if sharedBestValue.value < incumbent[1]:
+        # Рекорд улучшил другой процесс, его путь здесь неизвестен
+        incumbent = (None, sharedBestValue.value)
+    timeLimit = deadline - time.monotonic() if deadline is not None else None
+    if timeLimit is not None and timeLimit <= 0:
+        return None, incumbent[1], {"nodes_expanded": 0, "pruned": 0, "max_queue": 0, "stopped": "time",
+                                    "lower_bound": min(prefixBound, incumbent[1])}
+    return branchAndBoundV4(matrix, start, strategy=strategy, incumbent=incumbent, prefix=prefix,
+                            sharedBest=sharedBestValue, timeLimit=timeLimit, nodeLimit=nodeLimit,
+                            sharedNodes=sharedNodesValue)
+
+def splitPrefixes(matrix: list, start: int, taskCount: int, bestCost: float, deadline: float = None) -> list:
+    """Продлевает начало пути с наименьшей оценкой, пока начал не станет хотя бы taskCount
+    (больше не более чем на n - 2) или не наступит deadline, отбрасывая те, чья нижняя
+    оценка не лучше рекорда.
+    Возвращает пары (оценка, начало пути), упорядоченные по оценке, чтобы перспективные
+    подзадачи решались первыми"""
+    n = len(matrix)
+    prepared = prepareMatrix(matrix)
+    outgoing, incoming = prepared.outgoing, prepared.incoming
+    mstMatrix = prepared.mstMatrix
+    allMask = (1 << n) - 1
+    mstCache = prepared.mstCache
+    
+    # Куча (оценка, номер создания, стоимость, путь, маска); пути длины n - 1 уже не делятся
+    counter = count()
+    tasks = [(0, next(counter), 0, [start], 1 << start)]
+    complete = []
+    expired = False
+    while tasks and len(tasks) + len(complete) < taskCount and not expired:
+        task = heapq.heappop(tasks)
+        _, _, cost, path, visited = task
+        if len(path) >= n - 1:
+            complete.append(task)
+            continue
+        children = []
+        for weight, vertex in outgoing[path[-1]]:
+            if visited >> vertex & 1:
+                continue
+            if deadline is not None and time.monotonic() > deadline:
+                # Недораскрытое начало остается подзадачей целиком
+                expired = True
+                children = [task]
+                break
+            childVisited = visited | 1 << vertex
+            unvisited = allMask & ~childVisited
+            bound = cost + weight + max(lowerBound1(outgoing, incoming, start, vertex, unvisited),
+                                        lowerBound2(mstMatrix, unvisited, mstCache))
+            if bound < bestCost:
+                children.append((bound, next(counter), cost + weight, path + [vertex], childVisited))
+        for child in children:
+            heapq.heappush(tasks, child)
+    
+    tasks = sorted(tasks + complete)
+    return [(bound, path) for bound, _, _, path, _ in tasks]
+
+def parallelBranchAndBound(matrix: list, start: int, workers: int, strategy: str = "heuristic",
+                           incumbent: tuple = None, timeLimit: float = None, nodeLimit: int = None):
+    """Метод ветвей и границ в пуле из workers процессов. Первые уровни дерева делятся
+    на подзадачи, процессы обмениваются стоимостью рекорда через общую память.
+    nodeLimit - общий для всех процессов бюджет раскрытых узлов. Возвращает (путь, стоимость,
+    суммарные счетчики) с той же стоимостью, что и последовательный"""
+    bestPath, bestCost = incumbent if incumbent is not None and incumbent[0] is not None else (None, float('inf'))
+    stats = {"nodes_expanded": 0, "pruned": 0, "max_queue": 0, "stopped": None,
+             "lower_bound": bestCost, "gap": optimalityGap(bestCost, bestCost)}
+    deadline = time.monotonic() + timeLimit if timeLimit is not None else None
     
-    return bestPath, bestCost
+    tasks = splitPrefixes(matrix, start, workers * TASKS_PER_WORKER, bestCost, deadline)
+    if not tasks:
+        return bestPath, bestCost, stats
+    # Нижняя оценка по подзадачам, которые не были решены до конца
+    lowerBound = float('inf')
+    
+    sharedBest = multiprocessing.Value('d', bestCost)
+    sharedNodes = multiprocessing.Value('q', 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker,
+                             initargs=(sharedBest, sharedNodes)) as executor:
+        for path, cost, taskStats in executor.map(solveSubtree, repeat(matrix), repeat(start), repeat(strategy),
+                                                  repeat((bestPath, bestCost)), repeat(deadline), repeat(nodeLimit),
+                                                  tasks):
+            stats["nodes_expanded"] += taskStats["nodes_expanded"]
+            stats["pruned"] += taskStats["pruned"]
+            stats["max_queue"] = max(stats["max_queue"], taskStats["max_queue"])
+            stats["stopped"] = stats["stopped"] or taskStats["stopped"]
+            if taskStats["stopped"]:
+                lowerBound = min(lowerBound, taskStats["lower_bound"])
+            if path is not None and cost < bestCost:
+                bestPath, bestCost = path, cost
+    
+    stats["lower_bound"] = min(bestCost, lowerBound)
+    stats["gap"] = optimalityGap(bestCost, stats["lower_bound"])
+    return bestPath, bestCost, stats
 
-def improvedNearestInsertion(matrix: list, start: int):
+def heldKarp(matrix: list, start: int, verbose: int = 0, callback=None):
+    """Динамика Хелда-Карпа по подмножествам: dp[mask][j] - длина кратчайшего пути
+    из start через вершины mask, заканчивающегося в j. Слои по числу вершин в mask
+    считаются векторно в numpy, parent хранит предыдущую вершину для восстановления пути.
+    Возвращает (путь, стоимость, счетчики), в счетчиках states - число состояний dp"""
+    n = len(matrix)
+    stats = {"states": 0}
+    if n < 2:
+        return None, float('inf'), stats
+
+    trace = makeTracer(verbose, callback)
+    if trace:
+        trace("start", {"title": "Динамика Хелда-Карпа",
+                        "info": [f"Начальная вершина: {start}", f"Размер графа: {n}"]})
+
+    others = [v for v in range(n) if v != start]
+    m = n - 1
+    weights = np.array(matrix, dtype=np.float64)
+    weights[weights <= 0] = np.inf
+    W = weights[np.ix_(others, others)]
+
+    size = 1 << m
+    stats["states"] = m << (m - 1)
+    dp = np.full((size, m), np.inf)
+    parent = np.full((size, m), -1, dtype=np.int8)
+    for j in range(m):
+        dp[1 << j, j] = weights[start, others[j]]
+
+    masks = np.arange(size)
+    popcount = np.zeros(size, dtype=np.int8)
+    for b in range(m):
+        popcount += (masks >> b) & 1
+
+    for k in range(2, m + 1):
+        layer = masks[popcount == k]
+        for j in range(m):
+            selected = layer[(layer >> j) & 1 == 1]
+            candidates = dp[selected ^ (1 << j)] + W[:, j]
+            best = candidates.argmin(axis=1)
+            dp[selected, j] = candidates[np.arange(len(selected)), best]
+            parent[selected, j] = best
+
+    full = size - 1
+    total = dp[full] + weights[others, start]
+    last = int(total.argmin())
+    bestCost = float(total[last])
+    if bestCost == float('inf'):
+        return None, bestCost, stats
+
+    tail = []
+    mask = full
+    while last >= 0:
+        tail.append(others[last])
+        mask, last = mask ^ (1 << last), int(parent[mask, last])
+    bestPath = [start] + tail[::-1] + [start]
+    if bestCost.is_integer():
+        bestCost = int(bestCost)
+    if trace:
+        trace("incumbent", {"path": bestPath, "cost": bestCost})
+
+    return bestPath, bestCost, stats
+
+def exactTSP(matrix: list, start: int, method: str = "auto", verbose: int = 0, callback=None,
+             strategy: str = "heuristic", warmStart: bool = True, workers: int = 1, timeLimit: float = None,
+             nodeLimit: int = None):
+    """Точное решение: "bb" - метод ветвей и границ (порядок обхода strategy), "dp" - Хелд-Карп,
+    "auto" - Хелд-Карп при n <= HELD_KARP_LIMIT, иначе ветви и границы.
+    При warmStart метод ветвей и границ стартует с рекордом из heuristicTour,
+    при workers > 1 он решается в пуле процессов (без трассировки).
+    timeLimit и nodeLimit ограничивают только метод ветвей и границ; в timeLimit входит
+    и поиск начального рекорда, а когда время уже вышло, он не запускается"""
+    if method == "auto":
+        method = "dp" if len(matrix) <= HELD_KARP_LIMIT else "bb"
+    if method == "dp":
+        return heldKarp(matrix, start, verbose, callback)
+    deadline = time.monotonic() + timeLimit if timeLimit is not None else None
+    incumbent = None
+    if warmStart and (deadline is None or time.monotonic() < deadline):
+        incumbent = heuristicTour(matrix, start, deadline=deadline)
+    if deadline is not None:
+        timeLimit = max(0.0, deadline - time.monotonic())
+    if workers > 1:
+        return parallelBranchAndBound(matrix, start, workers, strategy, incumbent, timeLimit, nodeLimit)
+    return branchAndBoundV4(matrix, start, verbose, callback, strategy, incumbent=incumbent,
+                            timeLimit=timeLimit, nodeLimit=nodeLimit)
+
+def improvedNearestInsertion(matrix: list, start: int, verbose: int = 0, callback=None):
+    """Улучшенный алгоритм включения ближайшего города. События: start, inserted, closed.
+    Для каждой непосещенной вершины хранится лучшее место вставки (вершина пути, после
+    которой вставлять) и его цена. После вставки x между u и v пересчитываются целиком
+    только вершины, чьим лучшим ребром было удаленное u -> v, остальные лишь сравниваются
+    с двумя новыми ребрами. При равной цене, как и при полном переборе, выигрывает
+    вершина с меньшим номером и более раннее место в пути. Отсутствующие ребра (0 вне
+    диагонали) стоят бесконечно много, как в edgeWeight"""
     n = len(matrix)
     path = [start]
     cost = 0
-    visited = set([start])
     
-    print("\nУлучшенный алгоритм включения ближайшего города")
-    print(f"Начальный путь: {path}")
+    trace = makeTracer(verbose, callback)
+    if trace:
+        trace("start", {"title": "Улучшенный алгоритм включения ближайшего города",
+                        "info": [f"Начальный путь: {path}"]})
+    
+    weights = np.array(matrix, dtype=np.float64).reshape(n, n)
+    weights[(weights <= 0) & ~np.eye(n, dtype=bool)] = np.inf
+    candidates = np.arange(n)
+    # Цена вставки бывает бесконечной и у непосещенных вершин, поэтому посещенные отмечаются отдельно
+    inserted = np.zeros(n, dtype=bool)
+    inserted[start] = True
+    # Следующая вершина цикла и позиция вершины в пути
+    successor = np.full(n, start)
+    position = np.zeros(n, dtype=np.int64)
+    
+    bestCost = weights[start, :] + weights[:, start] - weights[start, start]
+    bestFrom = np.full(n, start)
+    bestCost[start] = np.inf
     
     step = 0
     
     while len(path) < n:
         step += 1
         
-        best_improvement = float('inf')
-        best_vertex = -1
-        best_position = -1
-        best_cost_change = 0
+        best_vertex = int(bestCost.argmin())
+        if bestCost[best_vertex] == np.inf:
+            return None, float('inf')
         
-        for candidate in range(n):
-            if candidate in visited:
-                continue
-                
-            for pos in range(len(path)):
-                current_vertex = path[pos]
-                next_vertex = path[(pos + 1) % len(path)]
-                
-                current_edge_cost = matrix[current_vertex][next_vertex]
-                new_edges_cost = matrix[current_vertex][candidate] + matrix[candidate][next_vertex]
-                cost_change = new_edges_cost - current_edge_cost
-                
-                if cost_change < best_improvement:
-                    best_improvement = cost_change
-                    best_vertex = candidate
-                    best_position = pos
-                    best_cost_change = cost_change
+        u = int(bestFrom[best_vertex])
+        v = int(successor[u])
+        best_position = int(position[u])
+        cost += matrix[u][best_vertex] + matrix[best_vertex][v] - matrix[u][v]
         
-        if best_vertex != -1:
-            cost += best_cost_change
-            path.insert(best_position + 1, best_vertex)
-            visited.add(best_vertex)
-            print(f"Шаг {step}: добавлена вершина {best_vertex} в позицию {best_position}, стоимость {cost}")
-        else:
-            return None, float('inf')
+        path.insert(best_position + 1, best_vertex)
+        successor[u] = best_vertex
+        successor[best_vertex] = v
+        position[position > best_position] += 1
+        position[best_vertex] = best_position + 1
+        bestCost[best_vertex] = np.inf
+        inserted[best_vertex] = True
+        
+        if trace:
+            trace("inserted", {"step": step, "vertex": best_vertex, "position": best_position, "cost": cost})
+        
+        unvisited = ~inserted
+        stale = unvisited & (bestFrom == u)
+        fresh = unvisited & ~stale
+        
+        # Вершины, потерявшие лучшее ребро u -> v, - полный пересчет по всем ребрам пути
+        if stale.any():
+            staleVertices = candidates[stale]
+            tail = np.array(path)
+            head = np.roll(tail, -1)
+            change = (weights[np.ix_(tail, staleVertices)] + weights[np.ix_(staleVertices, head)].T
+                      - weights[tail, head][:, None])
+            best = change.argmin(axis=0)
+            bestCost[stale] = change[best, np.arange(len(staleVertices))]
+            bestFrom[stale] = tail[best]
+        
+        # Остальные сравниваются с новыми ребрами u -> x (позиция best_position) и x -> v (следующая)
+        for edgeFrom, edgeTo, edgePosition in ((u, best_vertex, best_position),
+                                               (best_vertex, v, best_position + 1)):
+            change = weights[edgeFrom, :] + weights[:, edgeTo] - weights[edgeFrom, edgeTo]
+            better = fresh & ((change < bestCost)
+                              | ((change == bestCost) & (edgePosition < position[bestFrom])))
+            bestCost[better] = change[better]
+            bestFrom[better] = edgeFrom
     
+    # Путь все время рассматривался как цикл, и ребро path[-1] -> start уже учтено в cost
     if matrix[path[-1]][start] > 0:
-        closing_cost = matrix[path[-1]][start]
-        cost += closing_cost
         path.append(start)
-        print(f"Замыкание цикла: стоимость {cost}")
+        if trace:
+            trace("closed", {"path": path, "cost": cost})
         return path, cost
     
     return None, float('inf')
 
+def edgeWeight(matrix: list, u: int, v: int) -> float:
+    """Вес ребра; отсутствующее ребро (0 вне диагонали) считается бесконечно дорогим"""
+    weight = matrix[u][v]
+    return weight if weight > 0 or u == v else float('inf')
+
+def tourCost(matrix: list, path: list) -> float:
+    """Стоимость замкнутого пути [start, ..., start], inf если какого-то ребра нет"""
+    return sum(edgeWeight(matrix, path[i], path[i + 1]) for i in range(len(path) - 1))
+
+def twoOpt(matrix: list, tour: list, neighbours: list) -> bool:
+    """Первое улучшающее 2-opt: ребра a->b и c->d заменяются на a->c и b->d с разворотом
+    участка b..c. Кандидаты c берутся из ближайших соседей a. Для несимметричной матрицы
+    изменение стоимости развернутого участка считается по префиксным суммам прямых
+    и обратных ребер цикла. tour - цикл без повтора start, tour[0] не двигается"""
+    n = len(tour)
+    position = [0] * len(matrix)
+    for i, v in enumerate(tour):
+        position[v] = i
+    
+    forward = [0] * n
+    backward = [0] * n
+    for i in range(n - 1):
+        forward[i + 1] = forward[i] + edgeWeight(matrix, tour[i], tour[i + 1])
+        backward[i + 1] = backward[i] + edgeWeight(matrix, tour[i + 1], tour[i])
+    
+    for i in range(n - 1):
+        a, b = tour[i], tour[i + 1]
+        removedAB = edgeWeight(matrix, a, b)
+        for c in neighbours[a]:
+            addedAC = edgeWeight(matrix, a, c)
+            if addedAC >= removedAB:
+                break
+            j = position[c]
+            if j <= i + 1:
+                continue
+            d = tour[(j + 1) % n]
+            delta = (addedAC + edgeWeight(matrix, b, d) - removedAB - edgeWeight(matrix, c, d)
+                     + (backward[j] - backward[i + 1]) - (forward[j] - forward[i + 1]))
+            if delta < 0:
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                return True
+    return False
+
+def orOpt(matrix: list, tour: list, neighbours: list) -> bool:
+    """Первое улучшающее Or-opt: участок из 1-3 вершин переносится без разворота
+    в другое место цикла, сразу после одного из ближайших к его началу соседей"""
+    n = len(tour)
+    position = [0] * len(matrix)
+    for i, v in enumerate(tour):
+        position[v] = i
+    
+    for length in (1, 2, 3):
+        for i in range(1, n - length + 1):
+            first, last = tour[i], tour[i + length - 1]
+            before, after = tour[i - 1], tour[(i + length) % n]
+            removed = (edgeWeight(matrix, before, first) + edgeWeight(matrix, last, after)
+                       - edgeWeight(matrix, before, after))
+            for c in neighbours[first]:
+                j = position[c]
+                if i - 1 <= j < i + length:
+                    continue
+                # Участок не начинается с tour[0] и c не стоит перед ним, поэтому
+                # следующая за c вершина цикла не попадает в переносимый участок
+                e = tour[(j + 1) % n]
+                added = edgeWeight(matrix, c, first) + edgeWeight(matrix, last, e) - edgeWeight(matrix, c, e)
+                if added < removed:
+                    segment = tour[i:i + length]
+                    if j < i:
+                        tour[j + 1:i + length] = segment + tour[j + 1:i]
+                    else:
+                        tour[i:j + 1] = tour[i + length:j + 1] + segment
+                    return True
+    return False
+
+def localSearch(matrix: list, path: list, neighbourCount: int = NEIGHBOUR_COUNT, deadline: float = None):
+    """Улучшает замкнутый путь 2-opt и Or-opt до локального минимума.
+    Соседи вершины - neighbourCount самых легких исходящих (для 2-opt)
+    и входящих (для Or-opt) ребер. deadline (time.monotonic()) прерывает улучшение
+    между ходами, и возвращается лучший найденный к этому моменту путь"""
+    tour = path[:-1]
+    if len(tour) < 4:
+        return list(path), tourCost(matrix, path)
+    
+    outNeighbours, inNeighbours = nearestNeighbours(matrix, neighbourCount)
+    
+    while deadline is None or time.monotonic() < deadline:
+        if not (twoOpt(matrix, tour, outNeighbours) or orOpt(matrix, tour, inNeighbours)):
+            break
+    
+    path = tour + [tour[0]]
+    return path, tourCost(matrix, path)
+
+def heuristicTour(matrix: list, start: int, verbose: int = 0, callback=None, deadline: float = None):
+    """Эвристический цикл для начального рекорда: включение ближайшего города,
+    затем локальный поиск до deadline. (None, inf), если цикл по существующим ребрам не найден"""
+    path, _ = improvedNearestInsertion(matrix, start, verbose, callback)
+    if path is None or tourCost(matrix, path) == float('inf'):
+        return None, float('inf')
+    return localSearch(matrix, path, deadline=deadline)
+
+def instanceFiles(patterns: list) -> list:
+    """Файлы матриц: пути к файлам, каталоги (все файлы в них) и шаблоны glob"""
+    fileNames = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            names = (os.path.join(pattern, name) for name in os.listdir(pattern))
+            fileNames.extend(sorted(name for name in names if os.path.isfile(name)))
+        elif glob.has_magic(pattern):
+            fileNames.extend(sorted(glob.glob(pattern)))
+        else:
+            fileNames.append(pattern)
+    return fileNames
+
+def solveInstance(fileName: str, start: int = 0, solver: str = "auto", strategy: str = "heuristic",
+                  timeLimit: float = None, workers: int = 1, nodeLimit: int = None) -> dict:
+    """Решает задачу из файла и возвращает результат в виде словаря для вывода.
+    gap - относительный разрыв между найденной стоимостью и нижней оценкой (0 - доказанный оптимум)"""
+    startTime = time.perf_counter()
+    try:
+        matrix = loadMatrix(fileName)
+    except (OSError, ValueError) as error:
+        return {"instance": fileName, "status": "error", "error": str(error)}
+    n = len(matrix)
+    if not 0 <= start < n:
+        return {"instance": fileName, "n": n, "status": "error", "error": f"нет вершины {start}"}
+    
+    if solver == "heuristic":
+        deadline = time.monotonic() + timeLimit if timeLimit is not None else None
+        path, cost = heuristicTour(matrix, start, deadline=deadline)
+        nodes = 0
+        status = "heuristic"
+        lowerBound = rootLowerBound(matrix, start)
+    else:
+        if solver == "auto":
+            solver = "dp" if n <= HELD_KARP_LIMIT else "bb"
+        path, cost, stats = exactTSP(matrix, start, solver, strategy=strategy, workers=workers,
+                                     timeLimit=timeLimit, nodeLimit=nodeLimit)
+        nodes = stats.get("nodes_expanded", stats.get("states", 0))
+        stopped = stats.get("stopped")
+        status = {"time": "time_limit", "nodes": "node_limit"}.get(stopped, "optimal")
+        lowerBound = stats.get("lower_bound", cost)
+    
+    gap = optimalityGap(cost, lowerBound)
+    if path is None:
+        cost = None
+        status = "no_tour" if status in ("optimal", "heuristic") else status
+    if lowerBound == float('inf'):
+        lowerBound = None
+    
+    return {
+        "instance": fileName,
+        "n": n,
+        "start": start,
+        "solver": solver,
+        "status": status,
+        "tour": path,
+        "cost": cost,
+        "lower_bound": lowerBound,
+        "gap": None if gap is None else round(gap, 6),
+        "nodes": nodes,
+        "time": round(time.perf_counter() - startTime, 6),
+    }
+
+def batchMain(arguments: list):
+    parser = argparse.ArgumentParser(
+        description="Пакетное решение задачи коммивояжера для набора матриц с выводом в JSON Lines")
+    parser.add_argument("instances", nargs="+",
+                        help="файлы матриц (текстовые или двоичные), каталоги или шаблоны вида 'data/*.tspm'")
+    parser.add_argument("--start", type=int, default=0, help="начальная вершина")
+    parser.add_argument("--solver", choices=SOLVERS, default="auto",
+                        help="auto - Хелд-Карп до HELD_KARP_LIMIT вершин, иначе ветви и границы")
+    parser.add_argument("--strategy", choices=BB_STRATEGIES, default="heuristic",
+                        help="порядок обхода в методе ветвей и границ")
+    parser.add_argument("--time-limit", type=float, help="ограничение времени на одну задачу, секунды")
+    parser.add_argument("--node-limit", type=int, help="ограничение числа раскрытых узлов на одну задачу (общее для всех процессов)")
+    parser.add_argument("--output", help="файл для результатов (по умолчанию стандартный вывод)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="сколько задач решать одновременно в отдельных процессах (0 - все ядра)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="сколько процессов использовать для одной задачи методом ветвей и границ")
+    args = parser.parse_args(arguments)
+    
+    fileNames = instanceFiles(args.instances)
+    if not fileNames:
+        parser.error("не найдено ни одного файла матрицы")
+    
+    jobs = args.jobs or os.cpu_count() or 1
+    # Внутри процессов пула новый пул не создается
+    workers = 1 if jobs > 1 else max(1, args.workers)
+    solveArgs = (repeat(args.start), repeat(args.solver), repeat(args.strategy), repeat(args.time_limit),
+                 repeat(workers), repeat(args.node_limit))
+    
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(solveInstance, fileNames, *solveArgs)
+        else:
+            executor = None
+            results = map(solveInstance, fileNames, *solveArgs)
+        
+        for result in results:
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+        
+        if executor is not None:
+            executor.shutdown()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
 def main():
+    # С аргументами командной строки программа работает в пакетном режиме без меню
+    if len(sys.argv) > 1:
+        batchMain(sys.argv[1:])
+        return
+    
     fileName = "matrix.txt"
     startVertex = 0
+    exactMethod = "auto"
+    verbose = 1
 
     while True:
         print("\nМеню:")
@@ -258,7 +1201,9 @@ def main():
         print("2 - Сгенерировать симметричную матрицу")
         print("3 - Выбрать начальную вершину")
         print("4 - Загрузить матрицу и запустить алгоритмы")
-        print("5 - Выход")
+        print(f"5 - Выбрать точный метод (сейчас: {exactMethod})")
+        print(f"6 - Подробность вывода (сейчас: {verbose})")
+        print("7 - Выход")
         
         option = input("Выберите опцию: ").strip()
         
@@ -280,7 +1225,7 @@ def main():
             
         elif option == "4":
             try:
-                matrix = loadWightMatrix(fileName)
+                matrix = loadMatrix(fileName)
                 n = len(matrix)
                 print(f"Загружена матрица {n}x{n}")
                 break
@@ -288,20 +1233,38 @@ def main():
                 print(f"Файл {fileName} не найден")
                 
         elif option == "5":
+            method = input("Точный метод (auto - по размеру, bb - ветви и границы, dp - Хелд-Карп): ").strip()
+            if method in ("auto", "bb", "dp"):
+                exactMethod = method
+                print(f"Установлен метод {exactMethod}")
+            else:
+                print("Неверный метод")
+                
+        elif option == "6":
+            level = input("Подробность (0 - только результаты, 1 - ход решения, 2 - каждый узел): ").strip()
+            if level in ("0", "1", "2"):
+                verbose = int(level)
+                print(f"Установлена подробность {verbose}")
+            else:
+                print("Неверный уровень")
+                
+        elif option == "7":
             return
             
         else:
             print("Неверная опция")
 
-    bbPath, bbCost = branchAndBoundV4(matrix, startVertex)
-    niPath, niCost = improvedNearestInsertion(matrix, startVertex)
+    bbPath, bbCost, bbStats = exactTSP(matrix, startVertex, exactMethod, verbose)
+    niPath, niCost = improvedNearestInsertion(matrix, startVertex, verbose)
+    lsPath, lsCost = localSearch(matrix, niPath) if niPath is not None else (None, float('inf'))
 
     print("\nРезультаты:")
     
     if bbPath is not None and bbCost != float('inf'):
-        print(f"Метод ветвей и границ: путь {bbPath}, стоимость {bbCost}")
+        print(f"Точный метод: путь {bbPath}, стоимость {bbCost}")
+        print("Счетчики: " + ", ".join(f"{key}={value}" for key, value in bbStats.items()))
     else:
-        print("МВиГ: путь не найден")
+        print("Точный метод: путь не найден")
 
     if niPath is not None and niCost != float('inf'):
         print(f"Улучшенный АВБГ: путь {niPath}, стоимость {niCost}")
@@ -317,5 +1280,8 @@ def main():
     else:
         print("АВБГ: путь не найден")
 
+    if lsPath is not None and lsCost != float('inf'):
+        print(f"АВБГ + 2-opt/Or-opt: путь {lsPath}, стоимость {lsCost}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
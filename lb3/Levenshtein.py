@@ -1,7 +1,52 @@
 import sys
 
+def myersDistance(string1: str, string2: str) -> int:
+    """Расстояние Левенштейна с единичными стоимостями бит-параллельным алгоритмом Майерса-Хийрё.
+    Столбец матрицы хранится как битовые векторы положительных (Pv) и отрицательных (Mv)
+    вертикальных разностей длиной в более длинную строку, поэтому шаг по символу более
+    короткой строки - несколько операций над целыми Python"""
+    if len(string1) < len(string2):
+        string1, string2 = string2, string1
+    n = len(string1)
+    if not string2:
+        return n
+    
+    # Маски позиций каждого символа в более длинной строке
+    peq = {}
+    for i, char in enumerate(string1):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    
+    full = (1 << n) - 1
+    last = 1 << (n - 1)
+    pv = full
+    mv = 0
+    score = n
+    
+    for char in string2:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = mv | (full ^ (xh | pv))
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # Первая строка матрицы растет на 1 в каждом столбце
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (full ^ (xv | ph))
+        mv = ph & xv
+    
+    return score
+
 def wagnerFischerDistance(string1: str, string2: str, replaceCost: int, insertCost: int, deleteCost: int, doubleDeleteCost: int) -> int:
     """Ищет минимальное редакционное расстояние с учетом правила треугольника и операции удаления двух символов"""
+    # При единичных стоимостях удаление двух символов не дешевле двух удалений,
+    # и задача сводится к расстоянию Левенштейна
+    if replaceCost == insertCost == deleteCost == 1 and doubleDeleteCost >= 2:
+        return myersDistance(string1, string2)
+    
     n, m = len(string1), len(string2)
     
     # Проверяем правило треугольника для весов операций